@@ -4,58 +4,277 @@ Created on Mon Oct  3 19:57:43 2016
 
 @author: michael
 """
+import argparse
+import os
 import os.path
+import sys
+import time
+from array import array
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from glob import glob
+from itertools import chain, islice
 from Parser import Parser, CommandType
 from SymbolTable import SymbolTable
+from LineCache import LineCache
 import Code
+import HackImage
+import HackObject
+import Optimizer
 
 class Assembler(object):
     _BASE_VAR_ADDR = 16  # The first available memory address for variables
+    _WRITE_BATCH = 4096  # The number of words buffered per write when streaming
+    _MIN_CHUNK_SIZE = 1 << 18   # The smallest span of source given to a worker
 
-    def __init__(self, infile):
-        self._parser = Parser(infile)
+    def __init__(self, infile, streaming=False, binary=False, jobs=1, source=None,
+                 single_pass=False, cache_size=0, optimize=False, relocatable=False):
+        # In streaming mode the source is re-read from disk for the second
+        # pass, so memory use does not grow with the size of the input.
+        # The chunked parallel mode reads the source in the workers, so the
+        # parser is only created lazily in that case too.
+        # If source lines are given, infile is only used to name the output.
+        # The chunks are assembled by the plain two-pass assembler, so the
+        # single-pass engine, the line cache, and the optimizer run serially.
+        if single_pass or cache_size > 0 or optimize:
+            jobs = 1
+        self._infile = infile
+        self._parser = Parser(infile, streaming or jobs > 1 or cache_size > 0,
+                              None, source)
+        self._streaming = streaming
+        self._jobs = jobs
+        # The single-pass engine parses each instruction once and patches
+        # forward references at the end instead of re-reading the source
+        self._single_pass = single_pass
+        # With a line cache the two passes read whole lines and only lines
+        # that are not in the cache go through the lexer and parser
+        self._cache = LineCache(cache_size) if cache_size > 0 else None
+        # The optimizer rewrites the parsed commands before both passes
+        self._optimize = optimize
+        self._optimized = None
+        self._removed = None
+        self._shortened = None
+        self._literal_jumps = False
+        # Binary output is a packed uint16 image instead of the text format
+        self._binary = binary
+        # Relocatable output is an object file for the linker
+        self._relocatable = relocatable
         self._symbol_table = SymbolTable()
         self._var_addr = self._BASE_VAR_ADDR
+        self._instr_count = 0
         
         # create the output filename from the input filenam
-        base, ext = os.path.splitext(infile)
+        base, ext = os.path.splitext(infile or "")
         if ext.lower() != ".asm":
             base = infile
-        self._outfile = "{}.hack".format(base)
+        if infile is None:
+            self._outfile = None
+        elif relocatable:
+            self._outfile = "{}{}".format(base, HackObject.OBJECT_EXT)
+        elif binary:
+            self._outfile = "{}{}".format(base, HackImage.BINARY_EXT)
+        else:
+            self._outfile = "{}.hack".format(base)
+
+    def _get_encoders(self):
+        """Returns the a-command and c-command encoders for the output format
+        """
+        if self._binary:
+            return Code.gen_a_word, Code.gen_c_word
+        return Code.gen_a_command, Code.gen_c_command
 
     def _first_pass(self):
+        if self._cache is not None:
+            self._first_pass_cached()
+            return
         instr_count = 0
-        while self._parser.has_more_commands():
-            self._parser.advance()
-            cmd_type = self._parser.command_type
-            if (cmd_type == CommandType.A_COMMAND
-                or cmd_type == CommandType.C_COMMAND):
+        for cmd in self._commands():
+            if (cmd.Type == CommandType.A_COMMAND
+                or cmd.Type == CommandType.C_COMMAND):
                 instr_count += 1
-            elif cmd_type == CommandType.L_COMMAND:
-                self._symbol_table.add_entry(self._parser.symbol, instr_count)
+            elif cmd.Type == CommandType.L_COMMAND:
+                self._symbol_table.add_entry(cmd.Symbol, instr_count)
             else:
                 # TODO: Error handling
                 raise Exception("Something went wrong!")
-        # Consume the EOF token to "reset" the token queue
-        self._parser.advance()
+        self._instr_count = instr_count
+        # Go back to the start of the input for the second pass
+        self._parser.rewind()
 
     def _second_pass(self):
-        with open(self._outfile, 'w') as f:
-            while self._parser.has_more_commands():
-                self._parser.advance()
-                cmd_type = self._parser.command_type
+        self._write(self._encode())
+
+    def _encode(self):
+        """Generator function to yield the machine code of each instruction
+        """
+        if self._cache is not None:
+            yield from self._encode_cached()
+            return
+        gen_a_command, gen_c_command = self._get_encoders()
+        for cmd in self._commands():
+            if cmd.Type == CommandType.L_COMMAND:
+                # Skip labels -- they are already in the symbol table
+                continue
+            elif cmd.Type == CommandType.A_COMMAND:
+                addr = self._get_address(cmd.Symbol)
+                yield gen_a_command(addr)
+            elif cmd.Type == CommandType.C_COMMAND:
+                yield gen_c_command(cmd.Dest, cmd.Comp, cmd.Jump)
+
+    def _commands(self):
+        """Returns an iterable of the commands for a pass over the source
+        """
+        if self._optimized is not None:
+            return self._optimized
+        return self._parser.commands()
+
+    def _run_optimizer(self):
+        """Reads and optimizes all commands ahead of the two passes
+        """
+        commands = list(self._parser.commands())
+        if Optimizer.uses_literal_jumps(commands):
+            self._optimized = commands
+            self._removed = Counter()
+            self._shortened = 0
+            self._literal_jumps = True
+            return
+        commands, self._removed = Optimizer.peephole(commands)
+        self._optimized, removed, self._shortened = Optimizer.simplify_flow(
+            commands, exported=self._relocatable)
+        self._removed.update(removed)
+
+    def _parse_line(self, line):
+        """Parses a single normalized line; returns the command type and
+           either the encoded instruction or the symbol. Instructions that do
+           not depend on the symbol table, which includes a-commands with
+           numeric addresses, are returned encoded as C_COMMANDs.
+        """
+        gen_a_command, gen_c_command = self._get_encoders()
+        parser = Parser(None, source=[line])
+        parser.advance()
+        cmd_type = parser.command_type
+        if cmd_type not in (CommandType.A_COMMAND, CommandType.C_COMMAND,
+                            CommandType.L_COMMAND):
+            raise Exception("Invalid command: '{}'".format(line))
+        if parser.has_more_commands():
+            raise Exception("Expected a single command: '{}'".format(line))
+        if cmd_type == CommandType.C_COMMAND:
+            return cmd_type, gen_c_command(parser.dest, parser.comp, parser.jump)
+        elif cmd_type == CommandType.A_COMMAND:
+            try:
+                return CommandType.C_COMMAND, gen_a_command(int(parser.symbol))
+            except ValueError:
+                return cmd_type, parser.symbol
+        else:
+            return cmd_type, parser.symbol
+
+    def _cached_lines(self):
+        """Generator function to yield the parsed form of each command,
+           looking up every line in the line cache first
+        """
+        cache = self._cache
+        for line in self._parser.lines():
+            # Normalize the line by dropping comments and all whitespace
+            line = ''.join(line.split('//', 1)[0].split())
+            if not line:
+                continue
+            entry = cache.get(line)
+            if entry is None:
+                entry = self._parse_line(line)
+                cache.put(line, entry)
+            yield entry
+
+    def _first_pass_cached(self):
+        instr_count = 0
+        for cmd_type, value in self._cached_lines():
+            if cmd_type == CommandType.L_COMMAND:
+                self._symbol_table.add_entry(value, instr_count)
+            else:
+                instr_count += 1
+        self._instr_count = instr_count
+
+    def _encode_cached(self):
+        gen_a_command, _ = self._get_encoders()
+        for cmd_type, value in self._cached_lines():
+            if cmd_type == CommandType.C_COMMAND:
+                yield value
+            elif cmd_type == CommandType.A_COMMAND:
+                yield gen_a_command(self._get_address(value))
+
+    def _assemble_single_pass(self):
+        """Parses and encodes every instruction exactly once. A-commands that
+           reference symbols that are not yet defined are patched at the end,
+           which allocates variables in order of first use just like the
+           second pass of the two-pass assembler.
+        """
+        gen_a_command, gen_c_command = self._get_encoders()
+        table = self._symbol_table
+        words = []
+        fixups = []         # (index, symbol) of forward references
+        uses = {}           # indices of words already resolved, by symbol
+        redefined = set()   # symbols whose address changed after being used
+        label_count = 0
+        while self._parser.has_more_commands():
+            self._parser.advance()
+            cmd_type = self._parser.command_type
+            if cmd_type == CommandType.C_COMMAND:
+                words.append(gen_c_command(
+                    self._parser.dest,
+                    self._parser.comp,
+                    self._parser.jump))
+            elif cmd_type == CommandType.A_COMMAND:
+                symbol = self._parser.symbol
+                try:
+                    words.append(gen_a_command(int(symbol)))
+                except ValueError:
+                    addr = table.get_address(symbol)
+                    if addr is None:
+                        fixups.append((len(words), symbol))
+                        addr = 0
+                    else:
+                        uses.setdefault(symbol, []).append(len(words))
+                    words.append(gen_a_command(addr))
+            elif cmd_type == CommandType.L_COMMAND:
                 symbol = self._parser.symbol
-                if cmd_type == CommandType.L_COMMAND:
-                    # Skip labels -- they are already in the symbol table
-                    continue
-                elif cmd_type == CommandType.A_COMMAND:
-                    addr = self._get_address(symbol)
-                    f.write(Code.gen_a_command(addr) + '\n')
-                elif cmd_type == CommandType.C_COMMAND:
-                    f.write(Code.gen_c_command(
-                        self._parser.dest,
-                        self._parser.comp,
-                        self._parser.jump) + '\n')
+                if symbol in uses:
+                    # A label that replaces a symbol that was already used;
+                    # the two-pass assembler would use the new address
+                    redefined.add(symbol)
+                table.add_entry(symbol, len(words))
+                label_count += 1
+            else:
+                number, line = _find_line(self._parser.lines(), len(words) + label_count)
+                raise Exception("Invalid command on line {}: '{}'".format(number, line))
+        for index, symbol in fixups:
+            words[index] = gen_a_command(self._get_address(symbol))
+        for symbol in redefined:
+            word = gen_a_command(table.get_address(symbol))
+            for index in uses[symbol]:
+                words[index] = word
+        self._instr_count = len(words)
+        return words
+
+    def _write(self, words):
+        """Writes the machine code words to the output file
+        """
+        with open(self._outfile, 'wb' if self._binary else 'w') as f:
+            if self._binary:
+                HackImage.write_header(f, self._instr_count)
+            if self._streaming:
+                # Keep the buffer bounded when streaming large inputs
+                words = iter(words)
+                batch = list(islice(words, self._WRITE_BATCH))
+                while batch:
+                    self._write_words(f, batch)
+                    batch = list(islice(words, self._WRITE_BATCH))
+            else:
+                self._write_words(f, list(words))
+
+    def _write_words(self, f, words):
+        if self._binary:
+            HackImage.write_words(f, words)
+        else:
+            f.writelines(word + '\n' for word in words)
 
     def _get_address(self, symbol):
         try:
@@ -70,10 +289,338 @@ class Assembler(object):
                 self._var_addr += 1
             return self._symbol_table.get_address(symbol)
 
+    @property
+    def outfile(self):
+        """Returns the name of the file the machine code is written to
+        """
+        return self._outfile
+
+    @property
+    def instruction_count(self):
+        """Returns the number of instructions found by the first pass
+        """
+        return self._instr_count
+
+    @property
+    def removed(self):
+        """Returns a Counter of the instructions removed by each optimizer
+           rule, or None if the optimizer is disabled
+        """
+        return self._removed
+
+    @property
+    def jumps_shortened(self):
+        """Returns the number of jumps the optimizer retargeted past a chain
+           of unconditional jumps, or None if the optimizer is disabled
+        """
+        return self._shortened
+
+    @property
+    def literal_jumps(self):
+        """Returns True if the optimizer left the code alone because it
+           jumps to numeric addresses
+        """
+        return self._literal_jumps
+
+    @property
+    def cache(self):
+        """Returns the line cache, or None if caching is disabled
+        """
+        return self._cache
+
+    @property
+    def symbols(self):
+        """Returns the symbol table as a dictionary of symbols to addresses
+        """
+        return self._symbol_table.entries()
+
+    def _split(self, count):
+        """Splits the source into at most `count` spans of whole lines;
+           returns a list of (start, end) byte offsets
+        """
+        size = os.path.getsize(self._infile)
+        spans = []
+        start = 0
+        with open(self._infile, 'rb') as f:
+            for i in range(1, count):
+                f.seek(max(start, size * i // count))
+                f.readline()    # Move to the start of the next line
+                end = f.tell()
+                if end >= size:
+                    break
+                if end > start:
+                    spans.append((start, end))
+                    start = end
+        spans.append((start, size))
+        return spans
+
+    def _assemble_chunked(self):
+        """Assembles the source as separate chunks in parallel processes.
+           The output is identical to that of the serial two-pass assembler,
+           which is used instead for sources too small to split.
+        """
+        count = min(self._jobs, os.path.getsize(self._infile) // self._MIN_CHUNK_SIZE)
+        spans = self._split(count) if count > 1 else []
+        if len(spans) < 2:
+            # Too small to be worth starting worker processes for. Read it
+            # as the serial assembler would, rather than once per pass.
+            self._parser = Parser(self._infile, self._streaming)
+            self._first_pass()
+            self._second_pass()
+            return
+        files = [self._infile] * len(spans)
+        with ProcessPoolExecutor(max_workers=len(spans)) as pool:
+            # First pass: count instructions and find labels in each chunk
+            # and rebase the label addresses on the instructions before it
+            chunks = list(pool.map(_scan_chunk, files, spans))
+            for chunk_count, labels, _ in chunks:
+                for symbol, addr in labels.items():
+                    self._symbol_table.add_entry(symbol, self._instr_count + addr)
+                self._instr_count += chunk_count
+            # Allocate variables in the order they are first used, as the
+            # serial second pass would
+            for _, _, symbols in chunks:
+                for symbol in symbols:
+                    self._get_address(symbol)
+            # Second pass: encode each chunk against the complete table
+            entries = [self._symbol_table.entries()] * len(spans)
+            binary = [self._binary] * len(spans)
+            words = pool.map(_encode_chunk, files, spans, entries, binary)
+            self._write(chain.from_iterable(words))
+
     def assemble(self):
+        if self._relocatable:
+            HackObject.save(self._outfile, self.assemble_object())
+        elif self._jobs > 1:
+            self._assemble_chunked()
+        elif self._optimize:
+            self._run_optimizer()
+            self._first_pass()
+            self._second_pass()
+        elif self._single_pass:
+            self._write(self._assemble_single_pass())
+        else:
+            self._first_pass()
+            self._second_pass()
+
+    def assemble_words(self):
+        """Assembles the source and returns the machine code as an
+           array('H') instead of writing it to the output file
+        """
+        self._binary = True
+        if self._optimize:
+            self._run_optimizer()
         self._first_pass()
-        self._second_pass()
+        return array('H', self._encode())
+
+    def assemble_object(self):
+        """Assembles the source as a relocatable module loaded at address 0
+           and returns it as a HackObject.Module. Labels are exported,
+           predefined symbols are resolved, and any other symbol is left for
+           the linker to resolve.
+        """
+        if self._optimize:
+            self._run_optimizer()
+        self._first_pass()
+        predefined = SymbolTable()
+        exports = {symbol: address
+                   for symbol, address in self._symbol_table.entries().items()
+                   if not predefined.contains(symbol)}
+        code = []
+        relocations = []
+        references = {}
+        for cmd in self._commands():
+            if cmd.Type == CommandType.A_COMMAND:
+                symbol = cmd.Symbol
+                if symbol.isdigit():
+                    code.append(Code.gen_a_word(int(symbol)))
+                elif symbol in exports:
+                    relocations.append(len(code))
+                    code.append(exports[symbol])
+                elif predefined.contains(symbol):
+                    code.append(predefined.get_address(symbol))
+                else:
+                    references.setdefault(symbol, []).append(len(code))
+                    code.append(0)
+            elif cmd.Type == CommandType.C_COMMAND:
+                code.append(Code.gen_c_word(cmd.Dest, cmd.Comp, cmd.Jump))
+        return HackObject.Module(code, exports, relocations, references)
+
+def assemble_source(source, symbols=False):
+    """Assembles Hack assembly source without touching the filesystem.
+       The source may be a string or an iterable of lines. Returns the
+       machine code as an array('H'), or a tuple of the machine code and
+       the resolved symbol table if `symbols` is set.
+    """
+    if isinstance(source, str):
+        source = source.splitlines()
+    a = Assembler(None, source=source)
+    words = a.assemble_words()
+    if symbols:
+        return words, a.symbols
+    return words
+
+def _find_line(lines, index, first_line=1):
+    """Returns the number and the text of the line that holds command number
+       `index` of the input, counting from 0, since every command is on a
+       line of its own. Only used to report errors, so the input is read
+       again rather than tracked while parsing.
+    """
+    for number, line in enumerate(lines, first_line):
+        if line.split('//', 1)[0].strip():
+            if index == 0:
+                return number, line.strip()
+            index -= 1
+    return None, None
+
+def _scan_chunk(infile, span):
+    """First pass over a chunk of the source. Returns the number of
+       instructions, the labels with chunk-relative addresses, and the
+       symbols used by a-commands in the order of their first use.
+    """
+    parser = Parser(infile, True, span)
+    instr_count = 0
+    label_count = 0
+    labels = {}
+    symbols = {}
+    while parser.has_more_commands():
+        parser.advance()
+        cmd_type = parser.command_type
+        if cmd_type == CommandType.A_COMMAND:
+            instr_count += 1
+            symbol = parser.symbol
+            if symbol not in symbols:
+                try:
+                    int(symbol)
+                except ValueError:
+                    symbols[symbol] = None
+        elif cmd_type == CommandType.C_COMMAND:
+            instr_count += 1
+        elif cmd_type == CommandType.L_COMMAND:
+            labels[parser.symbol] = instr_count
+            label_count += 1
+        else:
+            start, end = span
+            with open(infile, 'rb') as f:
+                first_line = f.read(start).count(b'\n') + 1
+            number, line = _find_line(parser.lines(), instr_count + label_count, first_line)
+            raise Exception("Invalid command on line {} (in the chunk of bytes {}-{}): '{}'"
+                            .format(number, start, end, line))
+    return instr_count, labels, list(symbols)
+
+def _encode_chunk(infile, span, entries, binary):
+    """Second pass over a chunk of the source using the complete symbol table;
+       returns the list of machine code words
+    """
+    a = Assembler(infile, True, binary)
+    a._parser = Parser(infile, True, span)
+    a._symbol_table = SymbolTable(entries)
+    return list(a._encode())
+
+def _assemble_file(infile, options):
+    """Assembles a single file with the given Assembler keyword options.
+       Returns the output filename, the number of instructions, the elapsed
+       time, and a list of statistics lines for the enabled features.
+    """
+    start = time.perf_counter()
+    a = Assembler(infile, **options)
+    a.assemble()
+    elapsed = time.perf_counter() - start
+    stats = []
+    if a.literal_jumps:
+        stats.append("optimizer: skipped, the code jumps to numeric addresses")
+    elif a.removed is not None:
+        stats.append("optimizer: removed {} instructions ({})".format(
+            sum(a.removed.values()),
+            ", ".join("{} {}".format(k, v) for k, v in a.removed.most_common())
+            or "no rules applied"))
+        stats.append("optimizer: shortened {} jumps".format(a.jumps_shortened))
+    if a.cache is not None:
+        stats.append("line cache: {}".format(a.cache.stats()))
+    return a.outfile, a.instruction_count, elapsed, stats
+
+def get_file_list(sources):
+    """Expands the given files and folders to a list of .asm files
+    """
+    file_list = []
+    for source in sources:
+        source = os.path.normpath(source)
+        if os.path.isdir(source):
+            # For a folder, get a list of all .asm files
+            file_list.extend(sorted(glob(os.path.join(source, '*.asm'))))
+        else:
+            _, ext = os.path.splitext(source)
+            if ext.lower() != ".asm":
+                raise Exception("Invalid input file type: '{}'".format(source))
+            file_list.append(source)
+    return file_list
+
+def assemble_files(file_list, jobs=None, **options):
+    """Assembles the given files in a pool of `jobs` worker processes and
+       prints a timing line for each file and a summary at the end. A single
+       file is split into chunks that are assembled in parallel instead,
+       unless the single-pass engine, the line cache, or the optimizer is
+       enabled. Any other keyword options are passed on to the Assembler.
+       Returns the number of files that failed to assemble.
+    """
+    if len(file_list) == 0:
+        raise Exception("No valid files to assemble.")
+    start = time.perf_counter()
+    total = 0
+    failures = 0
+    for infile, result in _run_jobs(file_list, jobs or os.cpu_count(), options):
+        try:
+            outfile, count, elapsed, stats = result()
+        except Exception as ex:
+            failures += 1
+            print("Failed '{}': {}".format(infile, ex))
+            continue
+        total += count
+        print("Assembled '{}' -> '{}': {} instructions in {:.3f} s"
+              .format(infile, outfile, count, elapsed))
+        for line in stats:
+            print("  {}".format(line))
+    elapsed = time.perf_counter() - start
+    print("Assembled {} of {} files: {} instructions in {:.3f} s ({:.0f} instructions/s)"
+          .format(len(file_list) - failures, len(file_list), total, elapsed,
+                  total / elapsed if elapsed > 0 else 0))
+    return failures
+
+def _run_jobs(file_list, jobs, options):
+    """Generator function to yield each file with a callable that returns
+       its result, in the order the files finish
+    """
+    if len(file_list) == 1:
+        infile = file_list[0]
+        yield infile, lambda: _assemble_file(infile, dict(options, jobs=jobs))
+        return
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = {pool.submit(_assemble_file, infile, options): infile
+                   for infile in file_list}
+        for future in as_completed(futures):
+            yield futures[future], future.result
 
 if __name__ == "__main__":
-    a = Assembler(r"C:\Users\mlang\Desktop\programming\nand2tetris\06\pong\Pong.asm")
-    a.assemble()
\ No newline at end of file
+    parser = argparse.ArgumentParser()
+    parser.add_argument("sources", nargs='+',
+                        help="paths to the files or folders to assemble")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count(),
+                        help="number of worker processes (default: one per CPU)")
+    parser.add_argument("-s", "--streaming", action="store_true",
+                        help="re-read the source for the second pass to bound memory use")
+    parser.add_argument("-b", "--binary", action="store_true",
+                        help="write packed binary images instead of text .hack files")
+    parser.add_argument("-1", "--single-pass", action="store_true",
+                        help="parse each instruction once and backpatch forward references")
+    parser.add_argument("-c", "--cache", type=int, default=0, metavar="SIZE",
+                        help="cache up to SIZE distinct lines in the two-pass assembler")
+    parser.add_argument("-O", "--optimize", action="store_true",
+                        help="apply peephole and jump optimizations before encoding")
+    parser.add_argument("-r", "--relocatable", action="store_true",
+                        help="write relocatable object files for the linker")
+    args = parser.parse_args()
+    failures = assemble_files(get_file_list(args.sources), args.jobs,
+                              streaming=args.streaming, binary=args.binary,
+                              single_pass=args.single_pass, cache_size=args.cache,
+                              optimize=args.optimize, relocatable=args.relocatable)
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,370 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 20:14:52 2026
+
+@author: mlang
+"""
+from Emulator import Emulator
+import Code
+import HackState
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# The ALU operations on NumPy int16 arrays, which wrap on overflow by
+# themselves, with A standing for A or M
+_np_ops = {"0": lambda d, y: np.zeros_like(d),
+           "1": lambda d, y: np.ones_like(d),
+           "-1": lambda d, y: np.full_like(d, -1),
+           "D": lambda d, y: d.copy(),
+           "A": lambda d, y: y.copy(),
+           "!D": lambda d, y: ~d,
+           "!A": lambda d, y: ~y,
+           "-D": lambda d, y: -d,
+           "-A": lambda d, y: -y,
+           "D+1": lambda d, y: d + 1,
+           "A+1": lambda d, y: y + 1,
+           "D-1": lambda d, y: d - 1,
+           "A-1": lambda d, y: y - 1,
+           "D+A": lambda d, y: d + y,
+           "D-A": lambda d, y: d - y,
+           "A-D": lambda d, y: y - d,
+           "D&A": lambda d, y: d & y,
+           "D|A": lambda d, y: d | y}
+
+def _np_alu_bits(code):
+    """Returns a function computing the ALU output on arrays for any 6-bit
+       control code
+    """
+    zx, nx, zy, ny, f, no = [(code >> bit) & 1 for bit in (5, 4, 3, 2, 1, 0)]
+    def alu(d, y):
+        x = np.zeros_like(d) if zx else d
+        if nx:
+            x = ~x
+        if zy:
+            y = np.zeros_like(y)
+        if ny:
+            y = ~y
+        out = x + y if f else x & y
+        return ~out if no else out
+    return alu
+
+def _np_alu_table():
+    table = [_np_alu_bits(code) for code in range(64)]
+    for comp, code in Code.comp_table.items():
+        if 'M' not in comp:
+            table[code & 0x3F] = _np_ops[comp]
+    return table
+
+# The jump conditions on an array of ALU results
+_np_conditions = {1: lambda out: out > 0, 2: lambda out: out == 0,
+                  3: lambda out: out >= 0, 4: lambda out: out < 0,
+                  5: lambda out: out != 0, 6: lambda out: out <= 0}
+
+class _Group(object):
+    """Machines at the same program counter. `machines` is an array of their
+       indices, or None for all the machines when this is the only group;
+       `const` is the value they all hold in A, if it is known, and `steps`
+       the number of instructions they executed that are not yet counted.
+    """
+    __slots__ = ("pc", "machines", "const", "steps")
+
+    def __init__(self, pc, machines, const=None):
+        self.pc = pc
+        self.machines = machines
+        self.const = const
+        self.steps = 0
+
+class BatchEmulator(object):
+    """Runs one program on many Hack computers at once, typically with
+       different inputs. The registers of all the machines are NumPy arrays,
+       and their RAM is a (count, ram_size) int16 array.
+       The machines are kept in groups that share a program counter, and
+       each step executes one instruction for one group, using whole-array
+       operations while all the machines take the same path. A group splits
+       when its machines jump to different places and joins another one that
+       reaches the same address; the smallest group runs first, so that
+       machines that went their own way can catch up or stop.
+       A machine stops once its program counter runs past the program or it
+       reaches a loop that only jumps to itself, such as "(END) @END 0;JMP".
+       A stopped machine may still be carried along by the others, to keep
+       their operations whole-array, so its registers are saved when it
+       stops and its RAM is no longer written.
+    """
+    def __init__(self, rom, count, ram_size=Emulator.RAM_SIZE):
+        if np is None:
+            raise Exception("NumPy is required for the batch emulator.")
+        self._decoded = Emulator(rom)
+        self.rom = self._decoded.rom
+        self._spins, self._pairs = self._find_spins()
+        self._alu = _np_alu_table()
+        self.count = count
+        self.ram_size = ram_size
+        # Column-major, so that one address across all the machines is
+        # contiguous
+        self.ram = np.zeros((count, ram_size), dtype=np.int16, order='F')
+        self.a = np.zeros(count, dtype=np.int16)
+        self.d = np.zeros(count, dtype=np.int16)
+        self.pc = np.zeros(count, dtype=np.int64)
+        self.cycles = np.zeros(count, dtype=np.int64)
+        self._rows = np.arange(count)
+        self._live = np.ones(count, dtype=bool)
+        self._saved = []
+        self._groups = []
+        group = self._stop_halted(_Group(0, None, 0))
+        if group is not None:
+            self._groups.append(group)
+
+    @classmethod
+    def from_file(cls, filename, count, ram_size=Emulator.RAM_SIZE):
+        """Loads the program from a text or binary .hack file or an .asm file
+        """
+        return cls(Emulator.from_file(filename).rom, count, ram_size)
+
+    def restore(self, state):
+        """Puts every machine in a state taken from an emulator running the
+           same program, for instance once it is past the program's
+           initialization. The state's scheduled key presses are ignored.
+        """
+        if state.rom_hash != HackState.rom_hash(self.rom):
+            raise Exception("The state was saved from another program.")
+        if state.heap is not None and state.heap[1]:
+            raise Exception("The state holds natively allocated memory, so it can "
+                            "only be restored with native functions.")
+        ram = np.frombuffer(state.ram, dtype=np.int16)
+        if ram[self.ram_size:].any():
+            raise Exception("The state uses RAM beyond the first {} words."
+                            .format(self.ram_size))
+        self.ram[:] = ram[:self.ram_size]
+        self.a[:], self.d[:] = state.a, state.d
+        self.pc[:], self.cycles[:] = state.pc, state.cycles
+        self._live[:] = True
+        self._saved = []
+        self._groups = []
+        group = self._stop_halted(_Group(state.pc, None, state.a))
+        if group is not None:
+            self._groups.append(group)
+
+    @property
+    def halted(self):
+        """Returns a boolean array of the machines that have stopped
+        """
+        return ~self._live
+
+    def _find_spins(self):
+        """Finds the unconditional jumps that change nothing else. Such a jump
+           never leaves its loop if it jumps to itself, or to the a-command
+           just before it when that loads its own address. Returns two boolean
+           arrays indexed by address: the jumps, and those with such an
+           a-command before them.
+        """
+        decoded = self._decoded
+        size = len(self.rom)
+        spins = np.zeros(size, dtype=bool)
+        pairs = np.zeros(size, dtype=bool)
+        for pc in range(size):
+            if decoded._kind[pc] != 0 and decoded._jump[pc] == 7 and decoded._dest[pc] == 0:
+                spins[pc] = True
+                pairs[pc] = (pc > 0 and decoded._kind[pc - 1] == 0
+                             and decoded._value[pc - 1] == pc - 1)
+        return spins, pairs
+
+    def _members(self, group):
+        """Returns the indices of the running machines in the group
+        """
+        return np.flatnonzero(self._live) if group.machines is None else group.machines
+
+    def _size(self, group):
+        return self.count if group.machines is None else len(group.machines)
+
+    def _count(self, group):
+        """Adds the instructions the group executed to its machines' cycles
+        """
+        if group.steps:
+            self.cycles[slice(None) if group.machines is None else group.machines] += group.steps
+            group.steps = 0
+
+    def _memory(self, group, a):
+        """Returns the index into RAM of the RAM location selected by A, with
+           a single address if the whole group shares it
+        """
+        rows = slice(None) if group.machines is None else group.machines
+        if group.const is not None:
+            address = group.const & 0x7FFF
+            if address >= self.ram_size:
+                raise Exception("Memory access out of range at address {} (PC {})."
+                                .format(address, group.pc))
+            return rows, address
+        address = a & 0x7FFF
+        if address.max() >= self.ram_size:
+            # Stopped machines carried along may hold any address
+            outside = address >= self.ram_size
+            if group.machines is not None or (outside & self._live).any():
+                raise Exception("Memory access out of range at PC {}.".format(group.pc))
+            address = np.minimum(address, self.ram_size - 1)
+        return (self._rows if group.machines is None else group.machines), address
+
+    def _store(self, ram, out, masked):
+        """Writes the results to RAM, except for the stopped machines if
+           `masked` is set
+        """
+        rows, address = ram
+        if not masked:
+            self.ram[ram] = out
+        elif isinstance(address, int):
+            np.copyto(self.ram[:, address], out, where=self._live)
+        else:
+            live = self._live
+            self.ram[self._rows[live], address[live]] = out[live]
+
+    def _step(self, group):
+        """Executes the instruction at the group's program counter. Returns
+           the groups its machines end up in.
+        """
+        decoded = self._decoded
+        pc, machines = group.pc, group.machines
+        kind, value = decoded._kind[pc], decoded._value[pc]
+        rows = slice(None) if machines is None else machines
+        group.steps += 1
+        if kind == 0:
+            self.a[rows] = value
+            group.const = value
+            group.pc = pc + 1
+            return [group]
+        a = self.a[rows]
+        dest, jump = decoded._dest[pc], decoded._jump[pc]
+        if kind == 2 or dest & 1:
+            ram = self._memory(group, a)
+        y = a if kind == 1 else self.ram[ram]
+        out = self._alu[value](self.d[rows], y)
+        if jump:
+            target = a & 0x7FFF if group.const is None else group.const & 0x7FFF
+        if dest & 1:
+            self._store(ram, out, machines is None and self._saved)
+        if dest & 2:
+            self.d[rows] = out
+        if dest & 4:
+            self.a[rows] = out
+            group.const = None
+        if jump == 0:
+            group.pc = pc + 1
+            return [group]
+        if jump == 7:
+            if isinstance(target, int):
+                group.pc = target
+                return [group]
+            return self._split(group, target)
+        taken = _np_conditions[jump](out)
+        if isinstance(target, int):
+            # Only the running machines decide where the group goes
+            live = taken if machines is not None or not self._saved else taken[self._live]
+            if not live.any():
+                group.pc = pc + 1
+                return [group]
+            if live.all():
+                group.pc = target
+                return [group]
+        return self._split(group, np.where(taken, target, pc + 1))
+
+    def _split(self, group, pcs):
+        """Splits the group by the new program counters of its machines
+        """
+        members = self._members(group)
+        if group.machines is None:
+            pcs = pcs[members]
+        targets = np.unique(pcs)
+        if len(targets) == 1:
+            group.pc = int(targets[0])
+            return [group]
+        self._count(group)
+        return [_Group(int(target), members[pcs == target], group.const)
+                for target in targets]
+
+    def _stop_halted(self, group):
+        """Stops the machines of the group that have halted. Returns the group
+           of those still running, or None.
+        """
+        pc = group.pc
+        if pc < len(self.rom):
+            if not self._spins[pc]:
+                return group
+            if group.const is not None:
+                target = group.const & 0x7FFF
+                if target != pc and not (self._pairs[pc] and target == pc - 1):
+                    return group
+            else:
+                members = self._members(group)
+                target = self.a[members] & 0x7FFF
+                halted = (target == pc) | (self._pairs[pc] & (target == pc - 1))
+                if not halted.all():
+                    if halted.any():
+                        self._count(group)
+                        self._save(pc, members[halted])
+                        group.machines = members[~halted]
+                    return group
+        self._count(group)
+        self._save(pc, self._members(group))
+        return None
+
+    def _save(self, pc, machines):
+        """Marks the machines as stopped at `pc` and saves their registers
+        """
+        self.pc[machines] = pc
+        self._live[machines] = False
+        self._saved.append((machines, self.a[machines], self.d[machines],
+                            self.pc[machines], self.cycles[machines]))
+
+    def _join(self, group):
+        """Adds the group to the running ones, merging it with any group at the
+           same address
+        """
+        for other in self._groups:
+            if other.pc == group.pc:
+                self._count(other)
+                self._count(group)
+                other.machines = np.concatenate((other.machines, group.machines))
+                if other.const != group.const:
+                    other.const = None
+                return
+        self._groups.append(group)
+
+    def _sync(self):
+        """Stores the program counters of the running machines, and restores
+           the registers of the stopped ones
+        """
+        for group in self._groups:
+            self._count(group)
+            self.pc[self._members(group)] = group.pc
+        for machines, a, d, pc, cycles in self._saved:
+            self.a[machines], self.d[machines] = a, d
+            self.pc[machines], self.cycles[machines] = pc, cycles
+
+    def run(self, max_steps=None):
+        """Runs until every machine has stopped, or for at most `max_steps`
+           steps. Returns the number of steps taken.
+        """
+        groups = self._groups
+        steps = 0
+        try:
+            while groups and (max_steps is None or steps < max_steps):
+                group = min(groups, key=lambda g: (self._size(g), g.pc))
+                groups.remove(group)
+                for part in self._step(group):
+                    part = self._stop_halted(part)
+                    if part is not None:
+                        self._join(part)
+                if len(groups) == 1 and groups[0].machines is not None:
+                    # The stopped machines can be carried along
+                    self._count(groups[0])
+                    groups[0].machines = None
+                steps += 1
+        finally:
+            self._sync()
+        return steps
+
+    def read(self, address):
+        """Returns a copy of the given RAM location of every machine
+        """
+        return self.ram[:, address].copy()
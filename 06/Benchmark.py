@@ -0,0 +1,305 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 10:12:31 2026
+
+@author: mlang
+"""
+import argparse
+import os
+import random
+import os.path
+import tempfile
+import time
+from enum import Enum, unique
+from Lexer import Lexer, Token
+from HackToken import HackToken
+from Emulator import Emulator, load_keys
+from BlockEmulator import BlockEmulator
+from BatchEmulator import BatchEmulator
+
+@unique
+class CharacterClass(Enum):
+    LETTER = 1
+    DIGIT = 2
+    WHITESPACE = 3
+    MISC_CHAR = 4
+    OTHER = 5
+    EOF = 6
+
+class CharLexer(Lexer):
+    """The original character-at-a-time lexer, kept as a baseline to measure
+       the table-driven scanner against
+    """
+    def _file_iter(self):
+        with open(self.filename, 'r') as f:
+            for line in f:
+                for char in line:
+                    if self._skip_line:
+                        break
+                    yield char
+                self._skip_line = False
+
+    def _get_char(self):
+        try:
+            c = next(self._iter)
+            self.next_char = c
+            if c.isalpha():
+                self.char_class = CharacterClass.LETTER
+            elif c.isdecimal():
+                self.char_class = CharacterClass.DIGIT
+            elif c.isspace():
+                self.char_class = CharacterClass.WHITESPACE
+            elif c in ['_', '.', '$', ':']:
+                self.char_class = CharacterClass.MISC_CHAR
+            else:
+                self.char_class = CharacterClass.OTHER
+        except StopIteration:
+            self.next_char = None
+            self.char_class = CharacterClass.EOF
+
+    def _lex(self):
+        while self.char_class == CharacterClass.WHITESPACE:
+            self._get_char()
+        lexeme = self.next_char
+        if (self.char_class == CharacterClass.LETTER
+            or self.char_class == CharacterClass.MISC_CHAR):
+            self._get_char()
+            while (self.char_class == CharacterClass.LETTER
+                   or self.char_class == CharacterClass.DIGIT
+                   or self.char_class == CharacterClass.MISC_CHAR):
+                lexeme += self.next_char
+                self._get_char()
+            return Token(HackToken.IDENTIFIER, lexeme)
+        elif self.char_class == CharacterClass.DIGIT:
+            self._get_char()
+            while self.char_class == CharacterClass.DIGIT:
+                lexeme += self.next_char
+                self._get_char()
+            return Token(HackToken.NUMBER, lexeme)
+        elif self.char_class == CharacterClass.OTHER:
+            self._get_char()
+            if lexeme == '/' and self.next_char == '/':
+                self._skip_line = True
+                self._get_char()
+                return None
+            return self._token_cache[lexeme]
+        return Token(HackToken.EOF, None)
+
+    def analyze(self):
+        self._iter = self._file_iter()
+        self._skip_line = False
+        self._get_char()
+        while True:
+            token = self._lex()
+            if token is None:
+                continue
+            self.tokens.append(token)
+            if token.Token == HackToken.EOF:
+                break
+
+class NaiveEmulator(Emulator):
+    """A plain fetch-decode-execute loop that decodes every instruction each
+       time it runs, kept as a baseline for the emulators
+    """
+    def run(self, max_cycles=None):
+        rom = self.rom
+        ram = self.ram
+        a, d, pc = self.a, self.d, self.pc
+        count = 0
+        while pc < len(rom) and (max_cycles is None or count < max_cycles):
+            word = rom[pc]
+            count += 1
+            if word & 0x8000 == 0:
+                a = word
+                pc += 1
+                continue
+            y = ram[a & 0x7FFF] if word & 0x1000 else a
+            x = d
+            if word & 0x0800:
+                x = 0
+            if word & 0x0400:
+                x = ~x
+            if word & 0x0200:
+                y = 0
+            if word & 0x0100:
+                y = ~y
+            out = x + y if word & 0x0080 else x & y
+            if word & 0x0040:
+                out = ~out
+            out = ((out + 0x8000) & 0xFFFF) - 0x8000
+            target = a
+            if word & 0x0008:
+                ram[a & 0x7FFF] = out
+            if word & 0x0010:
+                d = out
+            if word & 0x0020:
+                a = out
+            if ((word & 0x0004 and out < 0) or (word & 0x0002 and out == 0)
+                or (word & 0x0001 and out > 0)):
+                pc = target & 0x7FFF
+            else:
+                pc += 1
+        self.a, self.d, self.pc = a, d, pc
+        self.cycles += count
+        return count
+
+def make_input(source, repeat):
+    """Writes `repeat` copies of the source file to a temporary file
+       and returns its name
+    """
+    with open(source, 'r') as f:
+        text = f.read()
+    fd, name = tempfile.mkstemp(suffix=".asm")
+    with os.fdopen(fd, 'w') as f:
+        for _ in range(repeat):
+            f.write(text)
+    return name
+
+def time_lexer(cls, filename, rounds):
+    """Returns the best wall time of `rounds` runs and the token count
+    """
+    best = None
+    for _ in range(rounds):
+        lexer = cls(filename)
+        start = time.perf_counter()
+        lexer.analyze()
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best, len(lexer.tokens)
+
+def bench_lexer(filename, rounds):
+    size = os.path.getsize(filename) / 1e6
+    print("Lexing '{}' ({:.1f} MB)".format(filename, size))
+    base, count = time_lexer(CharLexer, filename, rounds)
+    print("  per-character : {:7.3f} s  {:6.2f} MB/s".format(base, size / base))
+    new, new_count = time_lexer(Lexer, filename, rounds)
+    print("  regex scanner : {:7.3f} s  {:6.2f} MB/s".format(new, size / new))
+    if count != new_count:
+        raise Exception("Token counts differ: {} != {}".format(count, new_count))
+    print("  {} tokens, speedup {:.1f}x".format(count, base / new))
+
+def time_emulator(cls, rom, cycles, rounds):
+    """Returns the best wall time of `rounds` runs of `cycles` instructions
+       and the final emulator. Blocks compiled in the first round are reused
+       by the later ones.
+    """
+    best = None
+    for _ in range(rounds):
+        emulator = cls(rom)
+        start = time.perf_counter()
+        emulator.run(cycles)
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best, emulator
+
+def bench_emulator(filename, cycles, rounds):
+    rom = Emulator.from_file(filename).rom
+    print("Running '{}' ({} instructions) for {} cycles".format(filename, len(rom), cycles))
+    base, naive = time_emulator(NaiveEmulator, rom, cycles, rounds)
+    print("  naive          : {:7.3f} s  {:10.0f} instructions/s".format(base, cycles / base))
+    for name, cls in (("pre-decoded    ", Emulator), ("compiled blocks", BlockEmulator)):
+        elapsed, emulator = time_emulator(cls, rom, cycles, rounds)
+        print("  {}: {:7.3f} s  {:10.0f} instructions/s  speedup {:.1f}x".format(
+              name, elapsed, cycles / elapsed, base / elapsed))
+        if list(emulator.ram) != list(naive.ram) or emulator.pc != naive.pc:
+            raise Exception("The emulators disagree after {} cycles.".format(cycles))
+
+def bench_batch(filename, count, rounds):
+    """Runs the program on `count` machines with random values from 0 to 99
+       in R0 and R1, as a batch and one machine at a time. Each machine runs
+       for as many instructions as it took in the batch to stop.
+    """
+    rom = Emulator.from_file(filename).rom
+    inputs = [(random.randrange(100), random.randrange(100)) for _ in range(count)]
+    print("Running '{}' on {} machines".format(filename, count))
+    best = None
+    for _ in range(rounds):
+        batch = BatchEmulator(rom, count)
+        batch.ram[:, 0], batch.ram[:, 1] = zip(*inputs)
+        start = time.perf_counter()
+        batch.run()
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    total = base = 0
+    for i, (r0, r1) in enumerate(inputs):
+        start = time.perf_counter()
+        emulator = Emulator(rom)
+        emulator.ram[0], emulator.ram[1] = r0, r1
+        total += emulator.run(int(batch.cycles[i]))
+        base += time.perf_counter() - start
+        if list(emulator.ram) != batch.ram[i].tolist() or emulator.pc != batch.pc[i]:
+            raise Exception("Machine {} disagrees with the batch.".format(i))
+    print("  one at a time  : {:7.3f} s  {:10.0f} instructions/s".format(base, total / base))
+    print("  batch          : {:7.3f} s  {:10.0f} instructions/s  speedup {:.1f}x".format(
+          best, total / best, base / best))
+
+def bench_replay(filename, keys, cycles, rounds):
+    """Runs the program for `cycles` instructions with each emulator while
+       pressing the keys of a timeline, which makes an interactive program
+       such as Pong a repeatable workload. The emulators that execute every
+       instruction must end in the same state.
+    """
+    start = time.perf_counter()
+    program = Emulator.from_file(filename, native=False)
+    loaded = time.perf_counter() - start
+    print("Replaying {} key events into '{}' ({} instructions, loaded in {:.3f} s) "
+          "for {} cycles".format(len(keys), filename, len(program.rom), loaded, cycles))
+    reference = None
+    for name, cls, native in (("pre-decoded    ", Emulator, False),
+                              ("compiled blocks", BlockEmulator, False),
+                              ("native OS      ", BlockEmulator, True)):
+        best = None
+        for _ in range(rounds):
+            emulator = cls(program.rom, program.labels, native)
+            for cycle, key in keys:
+                emulator.schedule_key(cycle, key)
+            start = time.perf_counter()
+            emulator.run(cycles)
+            elapsed = time.perf_counter() - start
+            if best is None or elapsed < best:
+                best = elapsed
+        print("  {}: {:7.3f} s  {:10.0f} cycles/s{}".format(
+              name, best, emulator.cycles / best, "  (halted)" if emulator.halted else ""))
+        if native:
+            continue
+        if reference is None:
+            reference = emulator
+        elif list(emulator.ram) != list(reference.ram) or emulator.pc != reference.pc:
+            raise Exception("The emulators disagree after {} cycles.".format(cycles))
+
+if __name__ == "__main__":
+    here = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser()
+    parser.add_argument("source", nargs='?', default=os.path.join(here, "Pong.asm"),
+                        help="assembly file to use as the benchmark input")
+    parser.add_argument("-r", "--repeat", type=int, default=20,
+                        help="number of copies of the source to concatenate")
+    parser.add_argument("-n", "--rounds", type=int, default=3,
+                        help="number of timed runs; the best is reported")
+    parser.add_argument("-e", "--emulate", action="store_true",
+                        help="benchmark the emulators running the source instead of the lexer")
+    parser.add_argument("-c", "--cycles", type=int, default=5000000,
+                        help="number of instructions to emulate")
+    parser.add_argument("-b", "--batch", type=int, metavar="COUNT",
+                        help="benchmark running the source on COUNT machines at once "
+                             "with random inputs in R0 and R1")
+    parser.add_argument("-k", "--replay", nargs='?', const=os.path.join(here, "Pong.keys"),
+                        metavar="TIMELINE", help="benchmark the emulators running the source "
+                                                 "while pressing the keys in TIMELINE "
+                                                 "(by default Pong.keys)")
+    args = parser.parse_args()
+    if args.replay:
+        bench_replay(args.source, load_keys(args.replay), args.cycles, args.rounds)
+    elif args.batch:
+        bench_batch(args.source, args.batch, args.rounds)
+    elif args.emulate:
+        bench_emulator(args.source, args.cycles, args.rounds)
+    else:
+        infile = make_input(args.source, args.repeat)
+        try:
+            bench_lexer(infile, args.rounds)
+        finally:
+            os.remove(infile)
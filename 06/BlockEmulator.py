@@ -0,0 +1,324 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 18:26:40 2026
+
+@author: mlang
+"""
+import hashlib
+from collections import OrderedDict
+from Emulator import Emulator
+import Code
+
+# Python expressions for the ALU operations the assembler generates, in terms
+# of d and y (the value of A or M), and the ones whose result can overflow
+_expressions = {"0": "0", "1": "1", "-1": "-1",
+                "D": "d", "A": "{y}", "!D": "~d", "!A": "~{y}",
+                "-D": "-d", "-A": "-{y}",
+                "D+1": "d + 1", "A+1": "{y} + 1", "D-1": "d - 1", "A-1": "{y} - 1",
+                "D+A": "d + {y}", "D-A": "d - {y}", "A-D": "{y} - d",
+                "D&A": "d & {y}", "D|A": "d | {y}"}
+_overflows = {"-D", "-A", "D+1", "A+1", "D-1", "A-1", "D+A", "D-A", "A-D"}
+# For each 6-bit control code: the expression, whether it can overflow, and
+# whether it reads D and y
+_alu_expressions = {code & 0x3F: (_expressions[comp], comp in _overflows,
+                                  'D' in comp, 'A' in comp)
+                    for comp, code in Code.comp_table.items() if 'M' not in comp}
+
+def _wrap(expression):
+    return "((({}) + 32768) & 65535) - 32768".format(expression)
+
+# The condition under which each jump is taken
+_conditions = {1: "{} > 0", 2: "{} == 0", 3: "{} >= 0",
+               4: "{} < 0", 5: "{} != 0", 6: "{} <= 0"}
+
+class BlockEmulator(Emulator):
+    """An emulator that compiles the program into Python functions, one per
+       block, the first time each block is reached. A block runs from its
+       entry point through any unconditional jumps to constant addresses, up
+       to the next computed jump or the next address that a jump is known to
+       target; conditional jumps leave it early.
+       Within a block A and D are local variables, and while A holds a
+       constant loaded by an a-command, RAM is indexed with that constant
+       directly.
+       Compiled blocks are cached per ROM and entry points, so emulators
+       running the same program share them; the blocks of the programs
+       loaded least recently are dropped from the cache, but stay with the
+       emulators using them. Native functions start blocks of their own, so
+       that calls to them are seen.
+    """
+    _MAX_BLOCK = 256   # The most instructions compiled into one block
+    _UNLIMITED = 1 << 62
+    _BLOCK_CACHE_SIZE = 8   # The number of programs whose blocks are cached
+    _block_cache = OrderedDict()
+    # Addresses where a block always starts, even when a jump leads there
+    _entries = frozenset()
+    # The counters incremented by the blocks, see _count_exit
+    _exit_counts = None
+
+    def __init__(self, rom, labels=None, native=True):
+        super().__init__(rom, labels, native)
+        self._targets = self._find_targets()
+        # Only loops that some jump leads to with a constant are checked for
+        # being idle, since others would need A to hold their own address
+        self._idle_loops = {head: loop for head, loop in self._idle_loops.items()
+                            if head in self._targets}
+        self._stops = frozenset(self._idle_loops) | frozenset(self._natives)
+        self._entries = self._entries | self._stops
+        self._blocks = self._shared_blocks()
+
+    def _shared_blocks(self):
+        """Returns the list of compiled blocks for this program from the
+           cache, adding an empty one if there is none
+        """
+        cache = BlockEmulator._block_cache
+        # Where the blocks start depends on the native functions too
+        key = (hashlib.sha1(self.rom.tobytes()).hexdigest(), self._entries)
+        blocks = cache.get(key)
+        if blocks is None:
+            blocks = cache[key] = [None] * len(self.rom)
+            if len(cache) > self._BLOCK_CACHE_SIZE:
+                cache.popitem(last=False)
+        else:
+            cache.move_to_end(key)
+        return blocks
+
+    def _find_targets(self):
+        """Returns the addresses loaded into A just before a jump
+        """
+        targets = set()
+        kinds, values, jumps = self._kind, self._value, self._jump
+        for pc in range(1, len(self.rom)):
+            if jumps[pc] and kinds[pc - 1] == 0:
+                targets.add(values[pc - 1])
+        return targets
+
+    def reset(self):
+        """Clears the RAM and the registers. The RAM is a list rather than
+           an array, since CPython indexes lists about twice as fast.
+        """
+        super().reset()
+        self.ram = [0] * self.RAM_SIZE
+
+    def restore(self, state):
+        super().restore(state)
+        self.ram = self.ram.tolist()
+
+    def _trace(self, start):
+        """Returns the addresses of the instructions in the block starting at
+           `start`, and whether the block jumps back to its own start. A block
+           follows unconditional jumps to constant addresses, and ends at any
+           other unconditional jump, or where it would fall through to an
+           address that a jump targets.
+        """
+        kinds, values, jumps = self._kind, self._value, self._jump
+        end = len(self.rom)
+        path = []
+        loops = False
+        pc = start
+        while True:
+            path.append(pc)
+            target = None
+            if jumps[pc] and len(path) > 1 and kinds[path[-2]] == 0:
+                target = values[path[-2]]
+                loops = loops or target == start
+            if len(path) >= self._MAX_BLOCK:
+                return path, loops
+            if jumps[pc] == 7:
+                if (target is None or target == start or target >= end
+                    or target in path or target in self._entries):
+                    return path, loops
+                pc = target
+            else:
+                pc += 1
+                if pc >= end or pc in self._targets or pc in self._entries or pc in path:
+                    return path, loops
+
+    def _count_exit(self, path):
+        """Called for each way out of a compiled block, with the addresses
+           executed on the way. Returns the index of a counter for the block
+           to increment on the way out, or None to count nothing.
+        """
+        return None
+
+    def _compile(self, start):
+        """Compiles the block starting at `start`. Returns the function and
+           the greatest number of instructions it can execute. The function
+           takes the RAM, the values of A and D, and the number of
+           instructions it may execute, and returns the new values of A, D,
+           and the program counter, and the number of instructions executed.
+        """
+        path, loops = self._trace(start)
+        length = len(path)
+        lines = ["def block(ram, a, d, budget):"]
+        if loops:
+            # A block that jumps back to its start runs as a Python loop for
+            # as long as the budget allows another full pass
+            lines += ["    n = 0", "    while True:"]
+        indent = "        " if loops else "    "
+        emit = lambda line: lines.append(indent + line)
+        count = lambda k: "n + {}".format(k) if loops else str(k)
+        # The value of A, if it is known at compile time
+        constant = None
+        # Results are only wrapped to 16 bits where it matters: when they are
+        # stored, compared, or leave the block. Addresses are masked anyway,
+        # and the low 16 bits of the other operations don't depend on it.
+        a_wrapped = d_wrapped = True
+
+        def registers():
+            a = str(constant) if constant is not None else "a" if a_wrapped else _wrap("a")
+            return a, "d" if d_wrapped else _wrap("d")
+
+        def count_exit(k, prefix):
+            counter = self._count_exit(path[:k])
+            if counter is not None:
+                emit(prefix + "counts[{}] += 1".format(counter))
+
+        def leave(target, k, prefix=""):
+            count_exit(k, prefix)
+            emit(prefix + "return {}, {}, {}, {}".format(*registers(), target, count(k)))
+
+        def back_edge(k, prefix=""):
+            a, d = registers()
+            if a != "a":
+                emit(prefix + "a = " + a)
+            if d != "d":
+                emit(prefix + "d = " + d)
+            count_exit(k, prefix)
+            emit(prefix + "n += {}".format(k))
+            emit(prefix + "if n + {} > budget:".format(length))
+            emit(prefix + "    return a, d, {}, n".format(start))
+            emit(prefix + "continue")
+
+        for k, pc in enumerate(path, 1):
+            last = k == length
+            kind = self._kind[pc]
+            if kind == 0:
+                constant = self._value[pc]
+                if last:
+                    leave(pc + 1, k)
+                continue
+            address = "a & 32767" if constant is None else str(constant & 0x7FFF)
+            if kind == 1:
+                y = "a" if constant is None else str(constant)
+                y_wrapped = constant is not None or a_wrapped
+            else:
+                y = "ram[{}]".format(address)
+                y_wrapped = True
+            code = self._value[pc]
+            if code in _alu_expressions:
+                expression, overflows, uses_d, uses_y = _alu_expressions[code]
+                expression = expression.format(y=y)
+                wrapped = (not overflows and (d_wrapped or not uses_d)
+                           and (y_wrapped or not uses_y))
+            else:
+                expression = "alu[{}](d, {})".format(code, y)
+                wrapped = True
+            dest, jump = self._dest[pc], self._jump[pc]
+            if (dest & 1 or jump) and not wrapped:
+                expression = _wrap(expression)
+                wrapped = True
+            target = "a & 32767" if constant is None else str(constant & 0x7FFF)
+            if not jump and dest in (1, 2, 4):
+                # The common case: a single destination, no jump
+                result = expression
+            elif not dest:
+                # A jump only needs the result for its condition
+                result = "({})".format(expression)
+            else:
+                emit("out = {}".format(expression))
+                if jump and constant is None and dest & 4:
+                    emit("target = a & 32767")
+                    target = "target"
+                result = "out"
+            if dest & 1:
+                emit("ram[{}] = {}".format(address, result))
+            if dest & 2:
+                emit("d = {}".format(result))
+                d_wrapped = wrapped
+            if dest & 4:
+                emit("a = {}".format(result))
+                constant = None
+                a_wrapped = wrapped
+            if jump:
+                back = loops and target == str(start)
+                if jump == 7:
+                    if back:
+                        back_edge(k)
+                    elif last:
+                        leave(target, k)
+                    # Otherwise the block goes on at the target
+                    continue
+                # A conditional jump is a side exit, or a branch back to the
+                # start; otherwise the block goes on with the instructions it
+                # falls through to
+                emit("if {}:".format(_conditions[jump].format(result)))
+                if back:
+                    back_edge(k, "    ")
+                else:
+                    leave(target, k, "    ")
+            if last:
+                leave(pc + 1, k)
+        namespace = {"alu": self._alu, "counts": self._exit_counts}
+        exec(compile("\n".join(lines), "<block {}>".format(start), "exec"), namespace)
+        return namespace["block"], length
+
+    def _execute(self, max_cycles):
+        limit = self._UNLIMITED if max_cycles is None else max_cycles
+        end = len(self.rom)
+        count = 0
+        while count < limit and self.pc < end and self._spin is None:
+            if self.pc in self._idle_loops:
+                # Loops that may be idle run one instruction at a time, so
+                # that going around one is noticed
+                count += self._step(min(limit - count, self._MAX_IDLE_LOOP + 1))
+                continue
+            executed = self._run_blocks(limit - count)
+            count += executed
+            if executed == 0 and self.pc < end:
+                # Finish the last partial block one instruction at a time
+                count += self._step(limit - count)
+        return count
+
+    def _step(self, max_cycles):
+        """Executes instructions one at a time
+        """
+        return Emulator._execute(self, max_cycles)
+
+    def _run_blocks(self, budget):
+        """Runs whole blocks for up to `budget` instructions, until the
+           program halts or reaches a loop that may be idle, making calls to
+           native functions on the way. Returns the number of instructions
+           executed.
+        """
+        blocks = self._blocks
+        loops = self._idle_loops
+        natives = self._natives
+        stops = self._stops
+        ram = self.ram
+        a, d, pc = self.a, self.d, self.pc
+        end = len(self.rom)
+        count = 0
+        try:
+            while pc < end:
+                block = blocks[pc]
+                if block is None:
+                    block = blocks[pc] = self._compile(pc)
+                if count + block[1] > budget:
+                    break
+                a, d, pc, n = block[0](ram, a, d, budget - count)
+                count += n
+                if pc in stops:
+                    if pc in loops:
+                        break
+                    ret = natives[pc](ram)
+                    if ret is not None:
+                        a = pc = ret
+        except IndexError:
+            raise Exception("Memory access out of range in the block at PC {}.".format(pc))
+        finally:
+            self.a, self.d, self.pc = a, d, pc
+            self.cycles += count
+            # The blocks don't keep track of jumps; the next pass through a
+            # loop counts from here
+            self._run_start = self.cycles
+        return count
@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 16:21:44 2026
+
+@author: mlang
+"""
+import argparse
+import os.path
+import sys
+import time
+import Code
+import HackImage
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# The encoding tables inverted: every a-command, and every combination of the
+# low 13 bits of a c-command (comp, dest and jump fields) that the assembler
+# can produce. Invalid comp fields map to None.
+_comps = {code: comp for comp, code in Code.comp_table.items()}
+
+def _c_text(bits):
+    comp = _comps.get(bits >> 6)
+    if comp is None:
+        return None
+    dest = Code.Dest((bits >> 3) & 7).name
+    jump = Code.Jump(bits & 7).name
+    text = comp if dest == "null" else "{}={}".format(dest, comp)
+    return text if jump == "null" else "{};{}".format(text, jump)
+
+_a_table = ["@{}".format(address) for address in range(0x8000)]
+_c_table = [_c_text(bits) for bits in range(0x2000)]
+
+if np is not None:
+    _a_array = np.array(_a_table, dtype=object)
+    _c_array = np.array(_c_table, dtype=object)
+    _c_valid = np.array([text is not None for text in _c_table])
+
+def _invalid(address, word):
+    raise Exception("Invalid instruction {:016b} at address {}.".format(word, address))
+
+def disassemble(words):
+    """Returns the assembly source for the given machine code as a list of
+       lines, one instruction per line, with numeric addresses in place of
+       symbols. Raises an exception for words the assembler can't produce.
+    """
+    if np is None:
+        return _disassemble_python(words)
+    words = np.asarray(words, dtype=np.uint16)
+    # Decode the whole ROM at once: bit 15 splits a- and c-commands, and
+    # each kind is mapped through its table with a mask
+    is_c = words >= 0x8000
+    c_bits = words & 0x1FFF
+    bad = is_c & (((words & 0xE000) != 0xE000) | ~_c_valid[c_bits])
+    if bad.any():
+        address = int(np.flatnonzero(bad)[0])
+        _invalid(address, int(words[address]))
+    return np.where(is_c, _c_array[c_bits], _a_array[words & 0x7FFF]).tolist()
+
+def _disassemble_python(words):
+    lines = []
+    for address, word in enumerate(words):
+        if word < 0x8000:
+            lines.append(_a_table[word])
+        else:
+            text = _c_table[word & 0x1FFF]
+            if text is None or word & 0xE000 != 0xE000:
+                _invalid(address, word)
+            lines.append(text)
+    return lines
+
+def disassemble_file(infile, outfile):
+    """Disassembles a text or binary .hack file to the given .asm file.
+       Returns the number of instructions.
+    """
+    lines = disassemble(HackImage.load(infile, as_numpy=np is not None))
+    with open(outfile, 'w') as f:
+        f.writelines(line + '\n' for line in lines)
+    return len(lines)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("sources", nargs='+',
+                        help="paths to the .hack or binary image files to disassemble")
+    parser.add_argument("-o", "--output",
+                        help="path to the .asm file to write (only for a single source)")
+    args = parser.parse_args()
+    if args.output is not None and len(args.sources) > 1:
+        print("An output path can only be given for a single source.")
+        sys.exit(1)
+    for infile in args.sources:
+        outfile = args.output or "{}.dis.asm".format(os.path.splitext(infile)[0])
+        start = time.perf_counter()
+        count = disassemble_file(infile, outfile)
+        print("Disassembled '{}' -> '{}': {} instructions in {:.3f} s"
+              .format(infile, outfile, count, time.perf_counter() - start))
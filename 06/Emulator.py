@@ -0,0 +1,454 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 17:03:15 2026
+
+@author: mlang
+"""
+import argparse
+import bisect
+import copy
+import os.path
+import time
+from array import array
+from Assembler import assemble_source
+from NativeOS import NativeOS
+from Parser import Parser, CommandType
+from SymbolTable import SymbolTable
+import Code
+import HackImage
+import HackState
+
+def _wrap(value):
+    """Wraps an integer to a signed 16-bit value
+    """
+    return ((value + 0x8000) & 0xFFFF) - 0x8000
+
+def _alu_bits(code):
+    """Returns a function computing the ALU output for any 6-bit control code
+       (zx, nx, zy, ny, f, no) from the values of D and of A or M
+    """
+    zx, nx, zy, ny, f, no = [(code >> bit) & 1 for bit in (5, 4, 3, 2, 1, 0)]
+    def alu(d, y):
+        x = 0 if zx else d
+        if nx:
+            x = ~x
+        if zy:
+            y = 0
+        if ny:
+            y = ~y
+        out = x + y if f else x & y
+        return _wrap(~out if no else out)
+    return alu
+
+# The control codes the assembler generates, with A standing for A or M.
+# Operations that can't overflow don't need to be wrapped.
+_alu_ops = {"0": lambda d, y: 0,
+            "1": lambda d, y: 1,
+            "-1": lambda d, y: -1,
+            "D": lambda d, y: d,
+            "A": lambda d, y: y,
+            "!D": lambda d, y: ~d,
+            "!A": lambda d, y: ~y,
+            "-D": lambda d, y: _wrap(-d),
+            "-A": lambda d, y: _wrap(-y),
+            "D+1": lambda d, y: _wrap(d + 1),
+            "A+1": lambda d, y: _wrap(y + 1),
+            "D-1": lambda d, y: _wrap(d - 1),
+            "A-1": lambda d, y: _wrap(y - 1),
+            "D+A": lambda d, y: _wrap(d + y),
+            "D-A": lambda d, y: _wrap(d - y),
+            "A-D": lambda d, y: _wrap(y - d),
+            "D&A": lambda d, y: d & y,
+            "D|A": lambda d, y: d | y}
+
+def _alu_table():
+    table = [_alu_bits(code) for code in range(64)]
+    for comp, code in Code.comp_table.items():
+        if 'M' not in comp:
+            table[code & 0x3F] = _alu_ops[comp]
+    return table
+
+# Instruction kinds after decoding
+_A_INSTR = 0     # a-command: load the value into A
+_C_A = 1         # c-command computing with A
+_C_M = 2         # c-command computing with M
+
+def _find_idle_loops(kinds, values, dests, jumps, max_length):
+    """Finds the loops that can only change A and D: straight runs of
+       instructions from a head to a jump back to it, with no writes to RAM,
+       where A and D are each either left alone or written before they are
+       read, and the jump back doesn't compute its target. Every pass through
+       such a loop does the same, so once it has gone around it never
+       leaves, unless the keyboard changes.
+       Returns a dictionary of each head to a dictionary of the jumps back to
+       it, giving the length of the loop and whether it may read KBD.
+    """
+    loops = {}
+    size = len(kinds)
+    for head in range(size):
+        written = set()
+        read_first = set()
+        a = None            # The constant in A, if known
+        keyboard = False
+        for pc in range(head, min(size, head + max_length)):
+            if kinds[pc] == _A_INSTR:
+                written.add('A')
+                a = values[pc]
+                continue
+            dest, jump, code = dests[pc], jumps[pc], values[pc]
+            if dest & 1:
+                break
+            reads = set()
+            if not code & 0x20:
+                reads.add('D')
+            if kinds[pc] == _C_M:
+                reads.add('A')
+                keyboard = keyboard or a is None or a == Emulator.KBD
+            elif not code & 0x08:
+                reads.add('A')
+            if jump:
+                reads.add('A')
+            read_first |= reads - written
+            if dest & 2:
+                written.add('D')
+            if dest & 4:
+                written.add('A')
+                a = None
+            # The jump must lead back to the head with a constant, or with
+            # an A the loop leaves alone
+            if jump and not read_first & written and ('A' not in written or a == head):
+                loops.setdefault(head, {})[pc] = (pc - head + 1, keyboard)
+            if jump == 7:
+                break
+    return loops
+
+class Emulator(object):
+    """A Hack computer running a program from ROM. Each instruction is
+       decoded once when the program is loaded, into its kind, its value or
+       ALU function, and its dest and jump bits, so that running it only
+       takes a few array lookups.
+       Loops that can't change anything but A and D are found when the
+       program is loaded. Once the program goes around one, it either stops
+       for good, or, if the loop reads the keyboard and a key press is
+       scheduled, skips ahead to the press.
+       Given the program's labels, the emulator runs some Jack OS functions,
+       such as Math.multiply, as Python instead (see NativeOS) unless
+       `native` is turned off. A call run this way takes no instructions, so
+       the cycle counts are only exact without it.
+    """
+    RAM_SIZE = 24577     # Data memory, the screen, and the keyboard
+    KBD = 24576
+    SCREEN = 16384
+    _MAX_IDLE_LOOP = 64  # The longest loop checked for being idle
+
+    _alu = _alu_table()
+
+    def __init__(self, rom, labels=None, native=True):
+        """`labels` is a list of the program's (label, address) pairs, in
+           source order, if they are known
+        """
+        self.rom = array('H', rom)
+        self.labels = list(labels or [])
+        self._decode()
+        self._os = NativeOS(self.labels) if native else None
+        self._natives = self._os.routines if native else {}
+        # The jump targets where _execute has more to do than jump
+        self._stops = frozenset(self._idle_loops) | frozenset(self._natives)
+        self.reset()
+
+    @classmethod
+    def from_file(cls, filename, **options):
+        """Loads a text or binary .hack file, or assembles an .asm file and
+           takes its labels from the assembler's symbol table
+        """
+        if os.path.splitext(filename)[1].lower() != ".asm":
+            return cls(HackImage.load(filename), **options)
+        with open(filename, 'r') as f:
+            lines = f.read().splitlines()
+        rom, symbols = assemble_source(lines, symbols=True)
+        labels = [(cmd.Symbol, symbols[cmd.Symbol])
+                  for cmd in Parser(None, source=lines).commands()
+                  if cmd.Type == CommandType.L_COMMAND]
+        return cls(rom, labels, **options)
+
+    def _decode(self):
+        rom = self.rom
+        size = len(rom)
+        self._kind = array('B', bytes(size))
+        self._value = array('H', bytes(2 * size))
+        self._dest = array('B', bytes(size))
+        self._jump = array('B', bytes(size))
+        for pc, word in enumerate(rom):
+            if word < 0x8000:
+                self._kind[pc] = _A_INSTR
+                self._value[pc] = word
+            else:
+                self._kind[pc] = _C_M if word & 0x1000 else _C_A
+                self._value[pc] = (word >> 6) & 0x3F
+                self._dest[pc] = (word >> 3) & 7
+                self._jump[pc] = word & 7
+        self._idle_loops = _find_idle_loops(self._kind, self._value, self._dest, self._jump,
+                                            self._MAX_IDLE_LOOP)
+
+    def reset(self):
+        """Clears the RAM, the registers, the scheduled key presses, and the
+           native heap
+        """
+        if self._os is not None:
+            self._os.reset()
+        self.ram = array('h', bytes(2 * self.RAM_SIZE))
+        self.a = 0
+        self.d = 0
+        self.pc = 0
+        self.cycles = 0
+        self.idle = False
+        self._events = []
+        self._key_changed = 0
+        self._spin = None
+        # The cycle count when the last jump was taken. A loop has only been
+        # gone around once the jump back to its head comes at least the
+        # loop's length later, since the pass then ran through the head.
+        self._run_start = 0
+
+    @property
+    def halted(self):
+        """Returns True once the program counter has run past the program, or
+           the program is in a loop it can't leave
+        """
+        return self.pc >= len(self.rom) or self.idle
+
+    def schedule_key(self, cycle, key):
+        """Sets the keyboard register to `key` once `cycle` instructions have
+           been executed; 0 releases the key
+        """
+        bisect.insort(self._events, (cycle, key))
+        # A program waiting for a key may go on
+        self.idle = False
+
+    def snapshot(self):
+        """Returns the machine's state, for restore() or HackState.save()
+        """
+        return HackState.State(HackState.rom_hash(self.rom), array('h', self.ram),
+                               self.a, self.d, self.pc, self.cycles, self.idle,
+                               self._key_changed, tuple(self._events),
+                               self._os.heap() if self._natives else None)
+
+    def restore(self, state):
+        """Puts the machine back in a state taken from it or from another
+           emulator running the same program. The state can be restored any
+           number of times.
+        """
+        if state.rom_hash != HackState.rom_hash(self.rom):
+            raise Exception("The state was saved from another program.")
+        if self._natives:
+            if state.heap is None:
+                raise Exception("The state was saved without native functions, so "
+                                "their heap can't be restored.")
+            self._os.set_heap(state.heap)
+        elif state.heap is not None and state.heap[1]:
+            raise Exception("The state holds natively allocated memory, so it can "
+                            "only be restored with native functions.")
+        self.ram = array('h', state.ram)
+        self.a, self.d, self.pc = state.a, state.d, state.pc
+        self.cycles = state.cycles
+        self.idle = state.idle
+        self._key_changed = state.key_changed
+        self._events = list(state.events)
+        self._spin = None
+        self._run_start = self.cycles
+
+    def fork(self):
+        """Returns a new emulator in this one's state. It shares the decoded
+           program, and any compiled blocks, with this one, so many runs can
+           go on from one warmed-up state without loading it again.
+        """
+        other = copy.copy(self)
+        if self._os is not None:
+            other._os = NativeOS(self.labels)
+            other._natives = other._os.routines
+        other.restore(self.snapshot())
+        return other
+
+    def run(self, max_cycles=None):
+        """Runs until the program halts or `max_cycles` instructions have
+           been executed, pressing the scheduled keys on the way. Returns the
+           number of instructions executed, including those skipped in idle
+           loops.
+        """
+        events = self._events
+        total = 0
+        while not self.halted and total != max_cycles:
+            while events and events[0][0] <= self.cycles:
+                self.ram[self.KBD] = events.pop(0)[1]
+                self._key_changed = self.cycles
+            segment = None if max_cycles is None else max_cycles - total
+            if events:
+                until = events[0][0] - self.cycles
+                segment = until if segment is None else min(segment, until)
+            count = self._execute(segment)
+            total += count
+            if self._spin is not None:
+                length, keyboard = self._spin
+                self._spin = None
+                if keyboard and self.cycles - length < self._key_changed:
+                    # The key changed during this pass, so the next may differ
+                    continue
+                if not keyboard or not events:
+                    self.idle = True
+                    break
+                # Skip the passes through the loop up to the next key press,
+                # and run the rest of the last one
+                skip = (segment - count) // length * length
+                self.cycles += skip
+                self._run_start = self.cycles
+                total += skip
+        return total
+
+    def _execute(self, max_cycles):
+        """Executes instructions until the program halts, `max_cycles`
+           instructions have been executed, or the program has gone around
+           an idle loop, which sets `_spin` to the loop's length and whether
+           it reads the keyboard. Calls to native functions are made on the
+           way. Returns the number of instructions executed.
+        """
+        kinds, values, dests, jumps = self._kind, self._value, self._dest, self._jump
+        loops = self._idle_loops
+        natives = self._natives
+        stops = self._stops
+        alu = self._alu
+        ram = self.ram
+        a, d, pc = self.a, self.d, self.pc
+        end = len(kinds)
+        remaining = -1 if max_cycles is None else max_cycles
+        count = 0
+        # The last jump, counted from the start of this call
+        run_start = self._run_start - self.cycles
+        try:
+            while pc < end and count != remaining:
+                count += 1
+                kind = kinds[pc]
+                if kind == _A_INSTR:
+                    a = values[pc]
+                    pc += 1
+                    continue
+                out = alu[values[pc]](d, a if kind == _C_A else ram[a & 0x7FFF])
+                target = a
+                dest = dests[pc]
+                if dest:
+                    if dest & 1:
+                        ram[a & 0x7FFF] = out
+                    if dest & 2:
+                        d = out
+                    if dest & 4:
+                        a = out
+                jump = jumps[pc]
+                if jump and (jump == 7 or (jump & 4 and out < 0)
+                             or (jump & 2 and out == 0) or (jump & 1 and out > 0)):
+                    target &= 0x7FFF
+                    if target in stops:
+                        loop = loops.get(target)
+                        # Only a whole pass from the head counts; a program
+                        # that entered the loop in the middle hasn't run the
+                        # instructions before that yet
+                        if loop is not None and pc in loop and count - run_start >= loop[pc][0]:
+                            self._spin = loop[pc]
+                            pc = target
+                            run_start = count
+                            break
+                        native = natives.get(target)
+                        if native is not None:
+                            ret = native(ram)
+                            if ret is not None:
+                                a = pc = ret
+                                run_start = count
+                                continue
+                    pc = target
+                    run_start = count
+                else:
+                    pc += 1
+        except IndexError:
+            raise Exception("Memory access out of range at address {} (PC {})."
+                            .format(a & 0x7FFF, pc))
+        finally:
+            self.a, self.d, self.pc = a, d, pc
+            self._run_start = self.cycles + run_start
+            self.cycles += count
+        return count
+
+def _address(name):
+    """Converts a number or a predefined symbol to a RAM address
+    """
+    address = SymbolTable().get_address(name)
+    return int(name) if address is None else address
+
+def _assignment(text):
+    name, _, value = text.partition('=')
+    return _address(name), int(value)
+
+def _key_event(text):
+    """Parses CYCLE=KEY, where the key is a key code or a single character
+    """
+    cycle, _, key = text.partition('=')
+    return int(cycle), int(key) if key.isdigit() else ord(key)
+
+def load_keys(filename):
+    """Reads a keystroke timeline: a CYCLE=KEY pair per line, as for
+       schedule_key(), with blank lines and // comments ignored. Returns a
+       list of (cycle, key) pairs.
+    """
+    keys = []
+    with open(filename, 'r') as f:
+        for number, line in enumerate(f, 1):
+            line = line.split("//", 1)[0].strip()
+            if line:
+                try:
+                    keys.append(_key_event(line))
+                except (ValueError, TypeError):
+                    raise Exception("Invalid key event '{}' on line {} of '{}'."
+                                    .format(line, number, filename))
+    return keys
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("program", help="path to the .hack, binary image, or .asm file to run")
+    parser.add_argument("-n", "--cycles", type=int, default=10000000,
+                        help="maximum number of instructions to execute")
+    parser.add_argument("-s", "--set", type=_assignment, action="append", default=[],
+                        metavar="ADDR=VALUE", help="set a RAM location before running")
+    parser.add_argument("-p", "--print", type=_address, action="append", default=[],
+                        metavar="ADDR", help="print a RAM location after running")
+    parser.add_argument("-k", "--key", type=_key_event, action="append", default=[],
+                        metavar="CYCLE=KEY", help="press a key (a code or a character, 0 to "
+                                                  "release) once CYCLE instructions have run")
+    parser.add_argument("-K", "--keys", metavar="FILE",
+                        help="press the keys listed in FILE, one CYCLE=KEY per line")
+    parser.add_argument("-c", "--compile", action="store_true",
+                        help="compile the program's basic blocks to Python functions")
+    parser.add_argument("-x", "--exact", action="store_true",
+                        help="run the Jack OS functions from ROM too, for exact cycle counts")
+    parser.add_argument("-l", "--load-state", metavar="FILE",
+                        help="start from a state saved from the same program")
+    parser.add_argument("-w", "--save-state", metavar="FILE",
+                        help="save the state after running to FILE")
+    args = parser.parse_args()
+    if args.compile:
+        from BlockEmulator import BlockEmulator
+        emulator = BlockEmulator.from_file(args.program, native=not args.exact)
+    else:
+        emulator = Emulator.from_file(args.program, native=not args.exact)
+    if args.load_state:
+        emulator.restore(HackState.load(args.load_state))
+    for address, value in args.set:
+        emulator.ram[address] = value
+    for cycle, key in args.key + (load_keys(args.keys) if args.keys else []):
+        emulator.schedule_key(cycle, key)
+    start = time.perf_counter()
+    count = emulator.run(args.cycles)
+    elapsed = time.perf_counter() - start
+    print("{} after {} instructions in {:.3f} s ({:.0f} instructions/s)".format(
+          "Halted" if emulator.halted else "Stopped", count, elapsed,
+          count / elapsed if elapsed > 0 else 0))
+    for address in getattr(args, "print"):
+        print("RAM[{}] = {}".format(address, emulator.ram[address]))
+    if args.save_state:
+        HackState.save(args.save_state, emulator.snapshot())
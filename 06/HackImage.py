@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 11:02:47 2026
+
+@author: mlang
+
+Reading and writing Hack machine code images.
+
+The text format is the usual .hack file: one line of sixteen '0'/'1'
+characters per instruction. The binary format is a 12-byte header (the magic
+bytes b"HACK", a version number, a reserved field, and the word count)
+followed by the instructions as packed little-endian unsigned 16-bit words.
+"""
+import argparse
+import mmap
+import os.path
+import struct
+import sys
+from array import array
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+MAGIC = b"HACK"
+VERSION = 1
+BINARY_EXT = ".hackbin"
+
+_header = struct.Struct("<4sHHI")   # magic, version, reserved, word count
+
+def write_header(f, count):
+    """Writes the binary image header for `count` words to the open file
+    """
+    f.write(_header.pack(MAGIC, VERSION, 0, count))
+
+def write_words(f, words):
+    """Appends the given 16-bit words to an open binary image
+    """
+    data = array('H', words)
+    if sys.byteorder != "little":
+        data.byteswap()
+    data.tofile(f)
+
+def save(filename, words):
+    """Writes the given 16-bit words to a binary image file
+    """
+    data = array('H', words)
+    with open(filename, 'wb') as f:
+        write_header(f, len(data))
+        write_words(f, data)
+
+def load(filename, as_numpy=False):
+    """Loads a binary or text .hack file into an array('H'), or a NumPy uint16
+       array if `as_numpy` is set. The format is detected from the contents.
+       NumPy arrays loaded from binary images are read-only views of the
+       memory-mapped file.
+    """
+    if as_numpy and np is None:
+        raise Exception("NumPy is required to load an image as a NumPy array.")
+    with open(filename, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            # Empty files can't be memory-mapped
+            return np.zeros(0, dtype=np.uint16) if as_numpy else array('H')
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if mm[:len(MAGIC)] == MAGIC:
+        return _load_binary(mm, filename, as_numpy)
+    return _load_text(mm, filename, as_numpy)
+
+def _load_binary(mm, filename, as_numpy):
+    magic, version, _, count = _header.unpack_from(mm)
+    if version != VERSION:
+        raise Exception("Unsupported image version {} in '{}'."
+                        .format(version, filename))
+    end = _header.size + 2 * count
+    if len(mm) < end:
+        raise Exception("Truncated image '{}'.".format(filename))
+    if as_numpy:
+        return np.frombuffer(mm, dtype="<u2", count=count, offset=_header.size)
+    words = array('H')
+    words.frombytes(mm[_header.size:end])
+    if sys.byteorder != "little":
+        words.byteswap()
+    return words
+
+def _load_text(mm, filename, as_numpy):
+    if as_numpy:
+        data = np.frombuffer(mm, dtype=np.uint8)
+        # Fixed-width lines can be decoded without splitting the text
+        for width in (17, 18):
+            if len(data) % width == 0:
+                rows = data.reshape(-1, width)
+                if (rows[:, -1] == 10).all() and (width == 17 or (rows[:, 16] == 13).all()):
+                    bits = rows[:, :16] - ord('0')
+                    if (bits > 1).any():
+                        break
+                    packed = np.packbits(bits, axis=1)
+                    return packed.view(">u2").ravel().astype(np.uint16)
+    try:
+        words = array('H', [int(line, 2) for line in mm[:].split()])
+    except ValueError:
+        raise Exception("Invalid machine code in '{}'.".format(filename))
+    return np.array(words, dtype=np.uint16) if as_numpy else words
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("source", help="path to the .hack file to convert")
+    parser.add_argument("-o", "--output", help="path to the binary image to write")
+    args = parser.parse_args()
+    outfile = args.output or "{}{}".format(os.path.splitext(args.source)[0], BINARY_EXT)
+    save(outfile, load(args.source))
+    print("Output is '{}'".format(outfile))
@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 15:12:09 2026
+
+@author: mlang
+
+Reading and writing relocatable Hack object files.
+
+An object file is a JSON document holding a module's machine code as a list
+of 16-bit words, assembled as if the module were loaded at address 0, and
+the information the linker needs to place it anywhere in ROM:
+
+  exports      the module's labels and their module-relative addresses
+  relocations  the indices of a-commands that hold a module-relative label
+               address, to which the module's load address is added
+  references   for each symbol the module uses but does not define, the
+               indices of the a-commands that load it, in order of first use.
+               The linker resolves these to labels exported by another module,
+               or else allocates them as variables.
+"""
+import json
+from collections import namedtuple
+
+OBJECT_EXT = ".hobj"
+VERSION = 1
+
+Module = namedtuple("Module", ["code", "exports", "relocations", "references"])
+
+def save(filename, module):
+    """Writes the module to an object file
+    """
+    with open(filename, 'w') as f:
+        json.dump({"version": VERSION,
+                   "code": list(module.code),
+                   "exports": module.exports,
+                   "relocations": list(module.relocations),
+                   "references": module.references}, f)
+
+def load(filename):
+    """Reads a module from an object file
+    """
+    with open(filename, 'r') as f:
+        try:
+            data = json.load(f)
+        except ValueError:
+            raise Exception("Invalid object file '{}'.".format(filename))
+    if data.get("version") != VERSION:
+        raise Exception("Unsupported object file version {} in '{}'."
+                        .format(data.get("version"), filename))
+    return Module(data["code"], data["exports"], data["relocations"],
+                  data["references"])
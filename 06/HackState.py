@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 22:24:05 2026
+
+@author: mlang
+
+Reading and writing saved Hack machine states.
+
+A state is everything a run of a program depends on besides the program
+itself, which it names by the SHA-1 hash of its ROM: the RAM, the registers,
+the instruction count, the scheduled key presses, and the free list of the
+native Memory functions, if they are used.
+
+The file format is a 34-byte header (the magic bytes b"HSTA", a version
+number, flags, the ROM hash, A, D, and the PC) followed by the instruction
+count and the cycle of the last key change as little-endian 64-bit integers,
+the key presses as counted (cycle, key) pairs, the heap as counted lists of
+free (address, size) and allocated (address, size) pairs, and finally the
+RAM as zlib-compressed little-endian signed 16-bit words.
+"""
+import hashlib
+import struct
+import sys
+import zlib
+from array import array
+from collections import namedtuple
+
+MAGIC = b"HSTA"
+VERSION = 1
+STATE_EXT = ".hstate"
+
+_IDLE = 1      # Flags
+_HEAP = 2
+
+_header = struct.Struct("<4sHH20shhH")          # magic, version, flags, ROM hash, A, D, PC
+_counters = struct.Struct("<QQ")                # cycles, last key change
+_count = struct.Struct("<I")
+_event = struct.Struct("<QH")
+_block = struct.Struct("<HH")
+
+State = namedtuple("State", ["rom_hash", "ram", "a", "d", "pc", "cycles", "idle",
+                             "key_changed", "events", "heap"])
+State.__doc__ = """A machine state. `ram` is an array('h'), which must not be
+   changed, `events` a tuple of (cycle, key) pairs, and `heap` None, or a
+   tuple of the free and the allocated (address, size) pairs.
+"""
+
+def rom_hash(rom):
+    """Returns the hash that identifies the program in a state
+    """
+    return hashlib.sha1(array('H', rom).tobytes()).digest()
+
+def _pairs(data, offset, item):
+    count, = _count.unpack_from(data, offset)
+    offset += _count.size
+    pairs = tuple(item.unpack_from(data, offset + i * item.size) for i in range(count))
+    return pairs, offset + count * item.size
+
+def save(filename, state):
+    """Writes the state to a file
+    """
+    flags = (_IDLE if state.idle else 0) | (_HEAP if state.heap is not None else 0)
+    ram = array('h', state.ram)
+    if sys.byteorder != "little":
+        ram.byteswap()
+    with open(filename, 'wb') as f:
+        f.write(_header.pack(MAGIC, VERSION, flags, state.rom_hash,
+                             state.a, state.d, state.pc))
+        f.write(_counters.pack(state.cycles, state.key_changed))
+        f.write(_count.pack(len(state.events)))
+        for event in state.events:
+            f.write(_event.pack(*event))
+        for blocks in state.heap or ():
+            f.write(_count.pack(len(blocks)))
+            for block in blocks:
+                f.write(_block.pack(*block))
+        f.write(zlib.compress(ram.tobytes()))
+
+def load(filename):
+    """Reads a state from a file
+    """
+    with open(filename, 'rb') as f:
+        data = f.read()
+    if data[:len(MAGIC)] != MAGIC or len(data) < _header.size + _counters.size:
+        raise Exception("Invalid state file '{}'.".format(filename))
+    magic, version, flags, digest, a, d, pc = _header.unpack_from(data)
+    if version != VERSION:
+        raise Exception("Unsupported state file version {} in '{}'."
+                        .format(version, filename))
+    try:
+        cycles, key_changed = _counters.unpack_from(data, _header.size)
+        events, offset = _pairs(data, _header.size + _counters.size, _event)
+        heap = None
+        if flags & _HEAP:
+            free, offset = _pairs(data, offset, _block)
+            allocated, offset = _pairs(data, offset, _block)
+            heap = (free, allocated)
+        ram = array('h')
+        ram.frombytes(zlib.decompress(data[offset:]))
+    except (struct.error, zlib.error, ValueError):
+        raise Exception("Truncated or corrupt state file '{}'.".format(filename))
+    if sys.byteorder != "little":
+        ram.byteswap()
+    return State(digest, ram, a, d, pc, cycles, bool(flags & _IDLE), key_changed,
+                 events, heap)
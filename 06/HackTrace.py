@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 23:31:17 2026
+
+@author: mlang
+
+Reading and writing Hack execution traces.
+
+A trace is the last steps of a run, each an instruction the program
+executed or a call to a native function, with its number, the program
+counter it ran at, the instruction, the values of A and D after it,
+and the RAM location it wrote, if any.
+
+The file format is a 20-byte header (the magic bytes b"HTRC", a version
+number, a reserved field, the number of steps in the file, and the number
+of the first of them) followed by six columns of packed little-endian
+16-bit words, one word per step: the program counters, the instructions,
+A, D, the addresses written, with 0xFFFF for none, and the values written.
+"""
+import argparse
+import struct
+import sys
+from array import array
+from collections import namedtuple
+from Disassembler import disassemble
+
+MAGIC = b"HTRC"
+VERSION = 1
+TRACE_EXT = ".htrace"
+NO_WRITE = 0xFFFF
+
+_header = struct.Struct("<4sHHIQ")   # magic, version, reserved, step count, first step
+# The type codes of the columns
+_columns = ('H', 'H', 'h', 'h', 'H', 'h')
+
+Step = namedtuple("Step", ["number", "pc", "instruction", "a", "d", "address", "value"])
+
+def save(filename, first, pcs, instructions, a, d, addresses, values):
+    """Writes a trace, given as arrays of equal length, to a file. `first`
+       is the number of the first step, counting from 0.
+    """
+    with open(filename, 'wb') as f:
+        f.write(_header.pack(MAGIC, VERSION, 0, len(pcs), first))
+        for code, column in zip(_columns, (pcs, instructions, a, d, addresses, values)):
+            data = array(code, column)
+            if sys.byteorder != "little":
+                data.byteswap()
+            data.tofile(f)
+
+def load(filename):
+    """Reads a trace from a file. Returns a list of Steps, with None for the
+       address of the steps that didn't write to RAM.
+    """
+    with open(filename, 'rb') as f:
+        data = f.read()
+    if data[:len(MAGIC)] != MAGIC or len(data) < _header.size:
+        raise Exception("Invalid trace file '{}'.".format(filename))
+    magic, version, _, count, first = _header.unpack_from(data)
+    if version != VERSION:
+        raise Exception("Unsupported trace file version {} in '{}'."
+                        .format(version, filename))
+    if len(data) < _header.size + 2 * count * len(_columns):
+        raise Exception("Truncated trace file '{}'.".format(filename))
+    columns = []
+    offset = _header.size
+    for code in _columns:
+        column = array(code)
+        column.frombytes(data[offset:offset + 2 * count])
+        if sys.byteorder != "little":
+            column.byteswap()
+        columns.append(column)
+        offset += 2 * count
+    pcs, instructions, a, d, addresses, values = columns
+    return [Step(first + i, pcs[i], instructions[i], a[i], d[i],
+                 None if addresses[i] == NO_WRITE else addresses[i], values[i])
+            for i in range(count)]
+
+def format_steps(steps):
+    """Returns a line of text for each step
+    """
+    texts = disassemble([step.instruction for step in steps]) if steps else []
+    lines = []
+    for step, text in zip(steps, texts):
+        write = "" if step.address is None else "RAM[{}]={}".format(step.address, step.value)
+        lines.append("{:>10}  {:>5}  {:<12}  A={:<6} D={:<6} {}".format(
+                     step.number, step.pc, text, step.a, step.d, write).rstrip())
+    return lines
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("trace", help="path to the trace file to print")
+    parser.add_argument("-n", "--steps", type=int, default=50,
+                        help="number of steps to print, from the last")
+    args = parser.parse_args()
+    steps = load(args.trace)
+    for line in format_steps(steps[-args.steps:] if args.steps > 0 else []):
+        print(line)
@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 13:21:05 2026
+
+@author: mlang
+"""
+from collections import OrderedDict
+
+class LineCache(object):
+    """A bounded least-recently-used cache from normalized source lines to
+       their parsed and, where possible, encoded form
+    """
+    def __init__(self, size):
+        self._size = size
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, line):
+        """Returns the cached entry for the line, or None if not found
+        """
+        entry = self._entries.get(line)
+        if entry is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self._entries.move_to_end(line)
+        return entry
+
+    def put(self, line, entry):
+        """Adds an entry, evicting the least recently used one if full
+        """
+        self._entries[line] = entry
+        if len(self._entries) > self._size:
+            self._entries.popitem(last=False)
+
+    @property
+    def hit_rate(self):
+        """Returns the fraction of lookups that were found in the cache
+        """
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self):
+        """Returns a one-line summary of the cache statistics
+        """
+        return "{} hits, {} misses ({:.1%} hit rate), {} of {} entries used".format(
+            self.hits, self.misses, self.hit_rate, len(self._entries), self._size)
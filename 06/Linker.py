@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 15:40:26 2026
+
+@author: mlang
+"""
+import argparse
+import os.path
+import sys
+import time
+from array import array
+from SymbolTable import SymbolTable
+import HackImage
+import HackObject
+
+class Linker(object):
+    """Links relocatable modules from the assembler into one program. The
+       modules are placed in ROM in the order given.
+    """
+    _BASE_VAR_ADDR = 16  # The first available memory address for variables
+
+    def __init__(self, modules):
+        self._modules = list(modules)
+        self._symbol_table = SymbolTable()
+        self._var_addr = self._BASE_VAR_ADDR
+        self._bases = []
+        self._exports = {}
+        # Every label is exported, so two modules may well both have a label
+        # called LOOP; that is only an error if another module refers to it
+        self._ambiguous = set()
+        self._place()
+
+    def _place(self):
+        """Assigns each module its load address and each exported label its
+           final address
+        """
+        base = 0
+        for module in self._modules:
+            self._bases.append(base)
+            for symbol, address in module.exports.items():
+                if symbol in self._exports:
+                    self._ambiguous.add(symbol)
+                else:
+                    self._exports[symbol] = base + address
+            base += len(module.code)
+        if base > 0x8000:
+            raise Exception("The program is too large for ROM: {} instructions."
+                            .format(base))
+
+    def _resolve(self, symbol):
+        """Returns the address of a symbol referenced by a module. Symbols
+           no module exports are variables, allocated in order of first use.
+        """
+        if symbol in self._ambiguous:
+            raise Exception("Symbol '{}' is exported by more than one module."
+                            .format(symbol))
+        if symbol in self._exports:
+            return self._exports[symbol]
+        if not self._symbol_table.contains(symbol):
+            self._symbol_table.add_entry(symbol, self._var_addr)
+            self._var_addr += 1
+        return self._symbol_table.get_address(symbol)
+
+    def link(self):
+        """Returns the linked machine code as an array('H')
+        """
+        words = array('H')
+        for module, base in zip(self._modules, self._bases):
+            code = array('H', module.code)
+            for index in module.relocations:
+                code[index] += base
+            for symbol, indices in module.references.items():
+                address = self._resolve(symbol)
+                for index in indices:
+                    code[index] = address
+            words.extend(code)
+        return words
+
+    @property
+    def symbols(self):
+        """Returns the final addresses of the exported labels and variables
+        """
+        entries = self._symbol_table.entries()
+        entries.update(self._exports)
+        return entries
+
+def link_files(file_list, outfile, binary=False):
+    """Links the given object files into a text .hack file, or a binary
+       image if `binary` is set. Returns the number of instructions.
+    """
+    words = Linker(HackObject.load(infile) for infile in file_list).link()
+    if binary:
+        HackImage.save(outfile, words)
+    else:
+        with open(outfile, 'w') as f:
+            f.writelines("{:016b}\n".format(word) for word in words)
+    return len(words)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("objects", nargs='+',
+                        help="paths to the object files to link, in load order")
+    parser.add_argument("-o", "--output",
+                        help="path to the program to write (default: named after the first object)")
+    parser.add_argument("-b", "--binary", action="store_true",
+                        help="write a packed binary image instead of a text .hack file")
+    args = parser.parse_args()
+    for infile in args.objects:
+        if os.path.splitext(infile)[1].lower() != HackObject.OBJECT_EXT:
+            print("Invalid input file type: '{}'".format(infile))
+            sys.exit(1)
+    outfile = args.output
+    if outfile is None:
+        base = os.path.splitext(args.objects[0])[0]
+        outfile = base + (HackImage.BINARY_EXT if args.binary else ".hack")
+    start = time.perf_counter()
+    try:
+        count = link_files(args.objects, outfile, args.binary)
+    except Exception as ex:
+        print("Failed: {}".format(ex))
+        sys.exit(1)
+    print("Linked {} modules -> '{}': {} instructions in {:.3f} s"
+          .format(len(args.objects), outfile, count, time.perf_counter() - start))
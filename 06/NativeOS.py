@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 21:52:30 2026
+
+@author: mlang
+"""
+import bisect
+
+def _wrap(value):
+    """Wraps an integer to a signed 16-bit value
+    """
+    return ((value + 0x8000) & 0xFFFF) - 0x8000
+
+# RAM locations of the VM's pointers
+_SP, _LCL, _ARG, _THIS, _THAT = 0, 1, 2, 3, 4
+
+class NativeOS(object):
+    """Python versions of the Jack OS functions that programs spend the most
+       time in. Each one runs when the program jumps to the function's label
+       right after a VM call, that is with LCL equal to SP, and does what the
+       function and its return would: it reads its arguments at ARG, puts the
+       result in their place, and restores the caller's frame, leaving the
+       translator's temporary registers R13-R15 alone.
+       Memory.alloc and Memory.deAlloc keep their own free list rather than
+       the one the OS builds in the heap, so either both are run natively or
+       neither is.
+    """
+    HEAP_BASE = 2048
+    HEAP_END = 16384
+
+    def __init__(self, labels):
+        """`labels` is a list of (label, address) pairs. Function labels are
+           matched without regard to case, since some translators lower-case
+           them.
+        """
+        routines = {"math.multiply": self.multiply,
+                    "math.divide": self.divide,
+                    "memory.alloc": self.alloc,
+                    "memory.dealloc": self.deAlloc}
+        self.routines = {address: routines[label.lower()] for label, address in labels
+                         if label.lower() in routines}
+        self.reset()
+
+    def reset(self):
+        """Frees the whole heap
+        """
+        self._free = [(self.HEAP_BASE, self.HEAP_END - self.HEAP_BASE)]
+        self._sizes = {}
+
+    def heap(self):
+        """Returns the free and the allocated blocks, as tuples of (address,
+           size) pairs
+        """
+        return tuple(self._free), tuple(sorted(self._sizes.items()))
+
+    def set_heap(self, heap):
+        """Puts back the blocks returned by heap()
+        """
+        free, allocated = heap
+        self._free = list(free)
+        self._sizes = dict(allocated)
+
+    def _arguments(self, ram, count):
+        """Returns the arguments of the call, or None if the program didn't
+           get here through a call
+        """
+        if ram[_LCL] != ram[_SP]:
+            return None
+        arg = ram[_ARG]
+        return [ram[arg + i] for i in range(count)]
+
+    def _return(self, ram, value):
+        """Returns `value` to the caller the way the VM return does. Returns
+           the return address.
+        """
+        frame = ram[_LCL]
+        ret = ram[frame - 5] & 0x7FFF
+        ram[ram[_ARG]] = _wrap(value)
+        ram[_SP] = ram[_ARG] + 1
+        ram[_THAT] = ram[frame - 1]
+        ram[_THIS] = ram[frame - 2]
+        ram[_ARG] = ram[frame - 3]
+        ram[_LCL] = ram[frame - 4]
+        return ret
+
+    # Each routine takes the RAM and returns the address to go on at, or None
+    # to run the function's own code instead
+
+    def multiply(self, ram):
+        args = self._arguments(ram, 2)
+        if args is None:
+            return None
+        return self._return(ram, args[0] * args[1])
+
+    def divide(self, ram):
+        """Divides rounding toward zero. Division by zero is left to the OS
+           to report, and -32768, which has no positive counterpart, to its
+           own arithmetic.
+        """
+        args = self._arguments(ram, 2)
+        if args is None or args[1] == 0 or -32768 in args:
+            return None
+        x, y = args
+        quotient = abs(x) // abs(y)
+        return self._return(ram, quotient if (x < 0) == (y < 0) else -quotient)
+
+    def alloc(self, ram):
+        """First fit from the free list. A request the heap can't satisfy is
+           an error; a size that isn't positive is left to the OS to report.
+        """
+        args = self._arguments(ram, 1)
+        if args is None or args[0] <= 0:
+            return None
+        size = args[0]
+        for i, (address, length) in enumerate(self._free):
+            if length >= size:
+                if length == size:
+                    del self._free[i]
+                else:
+                    self._free[i] = (address + size, length - size)
+                self._sizes[address] = size
+                return self._return(ram, address)
+        raise Exception("Heap overflow: Memory.alloc({}) found no free block.".format(size))
+
+    def deAlloc(self, ram):
+        """Returns the block to the free list, merging it with its neighbours.
+           Addresses that weren't allocated are ignored.
+        """
+        args = self._arguments(ram, 1)
+        if args is None:
+            return None
+        address = args[0]
+        size = self._sizes.pop(address, None)
+        if size is not None:
+            free = self._free
+            i = bisect.bisect(free, (address, size))
+            free.insert(i, (address, size))
+            if i + 1 < len(free) and address + size == free[i + 1][0]:
+                free[i] = (address, size + free.pop(i + 1)[1])
+            if i > 0 and free[i - 1][0] + free[i - 1][1] == address:
+                free[i - 1] = (free[i - 1][0], free[i - 1][1] + free.pop(i)[1])
+        return self._return(ram, 0)
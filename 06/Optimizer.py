@@ -0,0 +1,246 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 14:05:52 2026
+
+@author: mlang
+"""
+from collections import Counter
+from Parser import Command, CommandType
+
+def _a(symbol):
+    return Command(CommandType.A_COMMAND, symbol, None, None, None)
+
+def _c(dest, comp, jump="null"):
+    return Command(CommandType.C_COMMAND, None, dest, comp, jump)
+
+def _is_a(cmd):
+    return cmd.Type == CommandType.A_COMMAND
+
+def _is_c(cmd, dest=None, comp=None):
+    """Returns True for a c-command without a jump, optionally with the given
+       dest and comp fields
+    """
+    return (cmd.Type == CommandType.C_COMMAND and cmd.Jump == "null"
+            and (dest is None or cmd.Dest == dest)
+            and (comp is None or cmd.Comp == comp))
+
+def uses_literal_jumps(commands):
+    """Returns True if the code jumps to a numeric address. Such code relies
+       on every instruction staying where it is, so it can't be optimized.
+    """
+    previous = None
+    for cmd in commands:
+        if (cmd.Type == CommandType.C_COMMAND and cmd.Jump != "null"
+            and previous is not None and _is_a(previous) and previous.Symbol.isdigit()):
+            return True
+        previous = cmd
+    return False
+
+# Peephole rules. Each rule is given the last few commands of the output and
+# returns the commands to replace them with, or None if it doesn't apply.
+# A rule never matches across a label, since a label is an entry point.
+
+def _inc_dec(w):
+    """M=M+1, M=M-1 (or the reverse) with the same A cancel each other out;
+       "@X, M=M+1, @X, M=M-1" gets here once the second @X is removed
+    """
+    if (_is_c(w[0], "M") and _is_c(w[1], "M")
+        and {w[0].Comp, w[1].Comp} == {"M+1", "M-1"}):
+        return []
+
+def _dead_load(w):
+    """@X, @Y: the first value of A is never used
+    """
+    if _is_a(w[0]) and _is_a(w[1]):
+        return [w[1]]
+
+def _same_load(w):
+    """@X, c, @X where c doesn't change A: A already holds X
+    """
+    if (_is_a(w[0]) and _is_a(w[2]) and w[0].Symbol == w[2].Symbol
+        and _is_c(w[1]) and 'A' not in w[1].Dest):
+        return w[:2]
+
+def _same_reload(w):
+    """@X, A=M, c, @X, A=M where c only writes D: A already holds RAM[X]
+    """
+    if (_is_a(w[0]) and _is_a(w[3]) and w[0].Symbol == w[3].Symbol
+        and _is_c(w[1], "A", "M") and _is_c(w[4], "A", "M")
+        and _is_c(w[2]) and w[2].Dest in ("D", "null")):
+        return w[:3]
+
+def _same_reload_direct(w):
+    """@X, A=M, @X, A=M: the second pair loads the same value again
+    """
+    if (_is_a(w[0]) and _is_a(w[2]) and w[0].Symbol == w[2].Symbol
+        and _is_c(w[1], "A", "M") and _is_c(w[3], "A", "M")):
+        return w[:2]
+
+_small_constants = {"0": "0", "1": "1"}
+
+def _load_constant(w):
+    """@0, D=A, @Y becomes D=0, @Y (and likewise for 1) once A is dead
+    """
+    if (_is_a(w[0]) and w[0].Symbol in _small_constants
+        and _is_c(w[1], "D", "A") and _is_a(w[2])):
+        return [_c("D", _small_constants[w[0].Symbol]), w[2]]
+
+# (name, window length, rule), tried in order after each command is added
+_rules = [("inc/dec", 2, _inc_dec),
+          ("dead load", 2, _dead_load),
+          ("same load", 3, _same_load),
+          ("same reload", 5, _same_reload),
+          ("same reload", 4, _same_reload_direct),
+          ("constant", 3, _load_constant)]
+
+def peephole(commands):
+    """Applies the peephole rules to a list of commands until none match.
+       Returns the new list and a Counter of the instructions removed
+       by each rule.
+    """
+    out = []
+    removed = Counter()
+    for cmd in commands:
+        out.append(cmd)
+        changed = True
+        while changed:
+            changed = False
+            for name, length, rule in _rules:
+                if len(out) < length:
+                    continue
+                window = out[-length:]
+                replacement = rule(window)
+                if replacement is not None:
+                    out[-length:] = replacement
+                    removed[name] += length - len(replacement)
+                    changed = True
+                    break
+    return out, removed
+
+# Control-flow simplification. The commands are split into basic blocks, each
+# a list of label commands followed by a body that ends at the first jump.
+# Code is assumed to only be entered through its labels (or by falling
+# through), so a label that is never loaded into A is never jumped to.
+
+def _blocks(commands):
+    blocks = [([], [])]
+    for cmd in commands:
+        labels, body = blocks[-1]
+        if cmd.Type == CommandType.L_COMMAND:
+            if body:
+                blocks.append(([cmd], []))
+            else:
+                labels.append(cmd)
+        else:
+            body.append(cmd)
+            if cmd.Type == CommandType.C_COMMAND and cmd.Jump != "null":
+                blocks.append(([], []))
+    return [block for block in blocks if block[0] or block[1]]
+
+def _ends_in_goto(body):
+    """Returns True if the body ends in an unconditional jump
+    """
+    return bool(body) and body[-1].Type == CommandType.C_COMMAND and body[-1].Jump == "JMP"
+
+def _is_trampoline(body):
+    """Returns True if the body is just @X, c;JMP with no side effects
+    """
+    return (len(body) == 2 and _is_a(body[0]) and _ends_in_goto(body)
+            and body[1].Dest == "null")
+
+def _final_target(label, forward):
+    """Follows a chain of trampolines to the last label, or returns None if
+       the chain loops
+    """
+    seen = {label}
+    while label in forward:
+        label = forward[label]
+        if label in seen:
+            return None
+        seen.add(label)
+    return label
+
+def _thread_jumps(blocks):
+    """Retargets jumps that land on a trampoline to the end of the chain.
+       Returns the number of jumps changed.
+    """
+    forward = {}
+    for labels, body in blocks:
+        if _is_trampoline(body):
+            for label in labels:
+                forward[label.Symbol] = body[0].Symbol
+    shortened = 0
+    for i, (labels, body) in enumerate(blocks):
+        if len(body) < 2 or not _is_a(body[-2]) or body[-1].Type != CommandType.C_COMMAND:
+            continue
+        jump = body[-1]
+        if jump.Jump == "null" or body[-2].Symbol not in forward:
+            continue
+        # The new target is also left in A, so the jump itself must not read
+        # or write through A, and a conditional jump can only be retargeted
+        # if the code it falls through to reloads A first
+        if 'A' in jump.Comp or 'M' in jump.Comp or 'M' in jump.Dest:
+            continue
+        if jump.Jump != "JMP" and i + 1 < len(blocks):
+            following = blocks[i + 1][1]
+            if following and not _is_a(following[0]):
+                continue
+        target = _final_target(body[-2].Symbol, forward)
+        if target is not None and target != body[-2].Symbol:
+            body[-2] = _a(target)
+            shortened += 1
+    return shortened
+
+def _drop_jumps_to_next(blocks, removed):
+    """Removes @L, c;J when L labels the very next command and that command
+       reloads A
+    """
+    for i, (labels, body) in enumerate(blocks[:-1]):
+        if (len(body) >= 2 and _is_a(body[-2])
+            and body[-1].Type == CommandType.C_COMMAND
+            and body[-1].Jump != "null" and body[-1].Dest == "null"):
+            next_labels, next_body = blocks[i + 1]
+            if (body[-2].Symbol in {label.Symbol for label in next_labels}
+                and (not next_body or _is_a(next_body[0]))):
+                del body[-2:]
+                removed["jump to next"] += 2
+
+def _drop_unreachable(blocks, removed, exported):
+    """Removes the blocks that can only be reached by falling through from an
+       unconditional jump. Returns the remaining blocks.
+    """
+    referenced = {cmd.Symbol for _, body in blocks for cmd in body if _is_a(cmd)}
+    if exported:
+        referenced.update(label.Symbol for labels, _ in blocks for label in labels)
+    kept = []
+    live = True
+    for labels, body in blocks:
+        if any(label.Symbol in referenced for label in labels):
+            live = True
+        if live:
+            if labels or body:
+                kept.append((labels, body))
+            live = not _ends_in_goto(body)
+        else:
+            removed["unreachable"] += len(body)
+    return kept
+
+def simplify_flow(commands, exported=False):
+    """Threads jump chains through to their final target and removes code
+       that can never be reached. If `exported` is set, other modules may
+       jump to any of the labels, so every label is kept reachable.
+       Returns the new list, a Counter of the instructions removed, and the
+       number of jumps that were shortened.
+    """
+    blocks = _blocks(commands)
+    removed = Counter()
+    shortened = 0
+    while True:
+        count = sum(removed.values())
+        changed = _thread_jumps(blocks)
+        shortened += changed
+        _drop_jumps_to_next(blocks, removed)
+        blocks = _drop_unreachable(blocks, removed, exported)
+        if not changed and sum(removed.values()) == count:
+            break
+    return [cmd for labels, body in blocks for cmd in labels + body], removed, shortened
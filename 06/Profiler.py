@@ -0,0 +1,208 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 21:37:09 2026
+
+@author: mlang
+"""
+import argparse
+import bisect
+from BlockEmulator import BlockEmulator
+from Emulator import Emulator, _assignment
+
+def _is_function(label):
+    """Returns True for the labels the VM translator gives functions, such
+       as Main.main, as opposed to labels within functions (Main.main$LOOP)
+       and its own generated labels
+    """
+    return '.' in label and '$' not in label
+
+class Profiler(BlockEmulator):
+    """A block emulator that counts how often each instruction runs. Each
+       compiled block increments one counter on each way out, and the
+       counters are turned into counts per address when they're read.
+       With the program's labels, the counts can be attributed to the
+       nearest preceding label, and the instructions executed in each VM
+       function are recorded by call stack: a jump to a function label with
+       a new frame, that is with LCL above the caller's, is a call, which
+       returns once LCL drops back below it. Instructions skipped in idle
+       loops aren't counted, nor, if `native` is set, are those of the
+       functions run natively, which are left out of the profile.
+    """
+    def __init__(self, rom, labels=None, native=False):
+        self._functions = {address: label for label, address in labels or []
+                           if _is_function(label)}
+        self._entries = frozenset(self._functions)
+        self._exit_counts = []
+        self._exit_paths = []
+        super().__init__(rom, labels, native)
+
+    def _shared_blocks(self):
+        # The blocks count into this profiler's counters, so they can't be
+        # shared with other emulators
+        return [None] * len(self.rom)
+
+    def reset(self):
+        """Clears the RAM, the registers, and the counts
+        """
+        super().reset()
+        self._clear_counts()
+
+    def restore(self, state):
+        """Puts the machine back in a saved state and clears the counts.
+           Calls made before the state was saved are left off the call stacks.
+        """
+        super().restore(state)
+        self._clear_counts()
+
+    def fork(self):
+        """Returns a new profiler in this one's state, with counts of its
+           own, and so blocks of its own
+        """
+        other = Profiler(self.rom, self.labels, self._os is not None)
+        other.restore(self.snapshot())
+        return other
+
+    def _clear_counts(self):
+        self._stepped = [0] * len(self.rom)
+        self._stack = []
+        self._stacks = {}
+        if self._exit_counts:
+            self._exit_counts[:] = [0] * len(self._exit_counts)
+        self._frames = self._enter(self.pc)
+
+    def _count_exit(self, path):
+        self._exit_counts.append(0)
+        self._exit_paths.append(path)
+        return len(self._exit_counts) - 1
+
+    def _enter(self, pc):
+        """Follows calls and returns on the way to `pc`. Returns the names of
+           the functions on the call stack.
+        """
+        stack = self._stack
+        lcl = self.ram[1]
+        while stack and stack[-1][1] > lcl:
+            stack.pop()
+        if pc in self._functions and (not stack or lcl > stack[-1][1]):
+            stack.append((self._functions[pc], lcl))
+        return tuple(name for name, _ in stack)
+
+    def _run_blocks(self, budget):
+        blocks = self._blocks
+        loops = self._idle_loops
+        natives = self._natives
+        stops = self._stops
+        ram = self.ram
+        stacks = self._stacks
+        stack = self._stack
+        watched = self._functions
+        frames = self._frames
+        a, d, pc = self.a, self.d, self.pc
+        end = len(self.rom)
+        count = 0
+        try:
+            while pc < end:
+                block = blocks[pc]
+                if block is None:
+                    block = blocks[pc] = self._compile(pc)
+                if count + block[1] > budget:
+                    break
+                start = pc
+                a, d, pc, n = block[0](ram, a, d, budget - count)
+                count += n
+                stacks[frames] = stacks.get(frames, 0) + n
+                if pc in stops:
+                    if pc in loops:
+                        break
+                    ret = natives[pc](ram)
+                    if ret is not None:
+                        a = pc = ret
+                if pc in watched or (stack and stack[-1][1] > ram[1]):
+                    frames = self._enter(pc)
+        except IndexError:
+            raise Exception("Memory access out of range in the block at PC {}.".format(start))
+        finally:
+            self.a, self.d, self.pc = a, d, pc
+            self._frames = frames
+            self.cycles += count
+            # The blocks don't keep track of jumps; the next pass through a
+            # loop counts from here
+            self._run_start = self.cycles
+        return count
+
+    def _step(self, max_cycles):
+        stack = self._stack
+        count = 0
+        while count < max_cycles and self.pc < len(self.rom) and self._spin is None:
+            self._stepped[self.pc] += 1
+            self._stacks[self._frames] = self._stacks.get(self._frames, 0) + 1
+            count += Emulator._execute(self, 1)
+            if self.pc in self._functions or (stack and stack[-1][1] > self.ram[1]):
+                self._frames = self._enter(self.pc)
+        return count
+
+    def counts(self):
+        """Returns a list of the number of times each instruction ran
+        """
+        counts = list(self._stepped)
+        for count, path in zip(self._exit_counts, self._exit_paths):
+            if count:
+                for pc in path:
+                    counts[pc] += count
+        return counts
+
+    def by_label(self, functions=False):
+        """Returns a list of (label, instructions executed) pairs, the most
+           executed first. Each instruction counts toward the nearest label
+           before it, or the nearest function label if `functions` is set;
+           instructions before the first label count toward "(start)".
+        """
+        labels = [(address, label) for label, address in self.labels
+                  if not functions or _is_function(label)]
+        # Of several labels at one address, the last one names the code
+        labels = sorted(dict(labels).items())
+        addresses = [address for address, _ in labels]
+        totals = {}
+        for pc, count in enumerate(self.counts()):
+            if count:
+                i = bisect.bisect_right(addresses, pc) - 1
+                label = labels[i][1] if i >= 0 else "(start)"
+                totals[label] = totals.get(label, 0) + count
+        return sorted(totals.items(), key=lambda item: (-item[1], item[0]))
+
+    def write_flamegraph(self, filename):
+        """Writes the instructions executed per VM call stack in the collapsed
+           format flamegraph.pl and speedscope read: the functions from the
+           outermost in, separated by semicolons, then the count
+        """
+        with open(filename, 'w') as f:
+            for frames, count in sorted(self._stacks.items()):
+                if count:
+                    f.write("{} {}\n".format(";".join(frames) or "(start)", count))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("program", help="path to the .asm (for labels), .hack, or binary image file")
+    parser.add_argument("-n", "--cycles", type=int, default=10000000,
+                        help="maximum number of instructions to execute")
+    parser.add_argument("-s", "--set", type=_assignment, action="append", default=[],
+                        metavar="ADDR=VALUE", help="set a RAM location before running")
+    parser.add_argument("-f", "--functions", action="store_true",
+                        help="attribute instructions to VM functions rather than to any label")
+    parser.add_argument("-t", "--top", type=int, default=20,
+                        help="number of rows to report")
+    parser.add_argument("-g", "--flamegraph", metavar="FILE",
+                        help="write the call stacks in collapsed format to FILE")
+    parser.add_argument("--native", action="store_true",
+                        help="run the Jack OS functions natively, leaving them out of the profile")
+    args = parser.parse_args()
+    profiler = Profiler.from_file(args.program, native=args.native)
+    for address, value in args.set:
+        profiler.ram[address] = value
+    total = profiler.run(args.cycles)
+    print("{} after {} instructions".format("Halted" if profiler.halted else "Stopped", total))
+    print("{:>12}  {:>6}  {}".format("instructions", "%", "label"))
+    for label, count in profiler.by_label(args.functions)[:args.top]:
+        print("{:12d}  {:5.1f}%  {}".format(count, 100.0 * count / total if total else 0, label))
+    if args.flamegraph:
+        profiler.write_flamegraph(args.flamegraph)
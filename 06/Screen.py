@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 22:58:41 2026
+
+@author: mlang
+"""
+import argparse
+import os.path
+import struct
+import sys
+import zlib
+from array import array
+from Emulator import Emulator, _key_event, load_keys
+
+# The bits of each byte in reverse order, since the Hack screen has its
+# leftmost pixel in the lowest bit and the image formats in the highest
+_reversed = bytes(int("{:08b}".format(i)[::-1], 2) for i in range(256))
+# PNG grayscale has 0 for black, and Hack 1
+_reversed_inverted = bytes(255 - b for b in _reversed)
+
+def _png_chunk(kind, data):
+    return (struct.pack(">I", len(data)) + kind + data
+            + struct.pack(">I", zlib.crc32(kind + data) & 0xFFFFFFFF))
+
+class Screen(object):
+    """Captures the screen of an emulator as images. The screen is compared
+       with the last frame each time a frame is taken, row by row, and only
+       the rows that changed are encoded again, so taking a frame of a screen
+       that didn't change costs one comparison.
+    """
+    WIDTH = 512
+    HEIGHT = 256
+    _ROW_BYTES = WIDTH // 8
+
+    def __init__(self, emulator):
+        self.emulator = emulator
+        self._words = None
+        self._data = bytes(self.HEIGHT * self._ROW_BYTES)
+        self._pbm_rows = [bytes(self._ROW_BYTES)] * self.HEIGHT
+        self._png_rows = [b"\0" + b"\xff" * self._ROW_BYTES] * self.HEIGHT
+
+    def update(self):
+        """Takes a frame. Returns the rows that changed since the last one.
+        """
+        # The screen memory is compared as it is, list or array, before it
+        # is converted
+        words = self.emulator.ram[Emulator.SCREEN:Emulator.KBD]
+        if words == self._words:
+            return []
+        self._words = words
+        words = array('h', words)
+        if sys.byteorder != "little":
+            words.byteswap()
+        data = words.tobytes()
+        size = self._ROW_BYTES
+        dirty = [row for row in range(self.HEIGHT)
+                 if data[row * size:(row + 1) * size] != self._data[row * size:(row + 1) * size]]
+        for row in dirty:
+            line = data[row * size:(row + 1) * size]
+            self._pbm_rows[row] = line.translate(_reversed)
+            self._png_rows[row] = b"\0" + line.translate(_reversed_inverted)
+        self._data = data
+        return dirty
+
+    def write_pbm(self, filename):
+        """Writes the current screen as a binary PBM image
+        """
+        self.update()
+        with open(filename, 'wb') as f:
+            f.write("P4\n{} {}\n".format(self.WIDTH, self.HEIGHT).encode("ascii"))
+            f.write(b"".join(self._pbm_rows))
+
+    def write_png(self, filename):
+        """Writes the current screen as a 1-bit grayscale PNG image
+        """
+        self.update()
+        header = struct.pack(">IIBBBBB", self.WIDTH, self.HEIGHT, 1, 0, 0, 0, 0)
+        with open(filename, 'wb') as f:
+            f.write(b"\x89PNG\r\n\x1a\n")
+            f.write(_png_chunk(b"IHDR", header))
+            f.write(_png_chunk(b"IDAT", zlib.compress(b"".join(self._png_rows))))
+            f.write(_png_chunk(b"IEND", b""))
+
+    def write(self, filename):
+        """Writes the current screen as a PNG or, for a .pbm file, a PBM image
+        """
+        if os.path.splitext(filename)[1].lower() == ".pbm":
+            self.write_pbm(filename)
+        else:
+            self.write_png(filename)
+
+    def record(self, pattern, interval, max_cycles=None):
+        """Runs the emulator until it halts or `max_cycles` instructions have
+           been executed, looking at the screen every `interval` instructions
+           and writing a frame whenever it changed. The frames are named by
+           formatting `pattern` with the instruction count. Returns the names
+           of the files written.
+        """
+        written = []
+        total = 0
+        while not self.emulator.halted and total != max_cycles:
+            step = interval if max_cycles is None else min(interval, max_cycles - total)
+            total += self.emulator.run(step)
+            if self.update():
+                filename = pattern.format(self.emulator.cycles)
+                self.write(filename)
+                written.append(filename)
+        return written
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("program", help="path to the .hack, binary image, or .asm file to run")
+    parser.add_argument("output", help="path to the .png or .pbm image to write, or with "
+                                       "--interval a pattern such as frame{:09d}.png")
+    parser.add_argument("-n", "--cycles", type=int, default=10000000,
+                        help="maximum number of instructions to execute")
+    parser.add_argument("-i", "--interval", type=int,
+                        help="write a frame every INTERVAL instructions if the screen changed")
+    parser.add_argument("-k", "--key", type=_key_event, action="append", default=[],
+                        metavar="CYCLE=KEY", help="press a key (a code or a character, 0 to "
+                                                  "release) once CYCLE instructions have run")
+    parser.add_argument("-K", "--keys", metavar="FILE",
+                        help="press the keys listed in FILE, one CYCLE=KEY per line")
+    parser.add_argument("-c", "--compile", action="store_true",
+                        help="compile the program's basic blocks to Python functions")
+    parser.add_argument("-x", "--exact", action="store_true",
+                        help="run the Jack OS functions from ROM too, for exact cycle counts")
+    args = parser.parse_args()
+    if args.compile:
+        from BlockEmulator import BlockEmulator
+        emulator = BlockEmulator.from_file(args.program, native=not args.exact)
+    else:
+        emulator = Emulator.from_file(args.program, native=not args.exact)
+    for cycle, key in args.key + (load_keys(args.keys) if args.keys else []):
+        emulator.schedule_key(cycle, key)
+    screen = Screen(emulator)
+    if args.interval:
+        written = screen.record(args.output, args.interval, args.cycles)
+        print("Wrote {} frames after {} instructions".format(len(written), emulator.cycles))
+    else:
+        emulator.run(args.cycles)
+        screen.write(args.output)
+        print("Output is '{}'".format(args.output))
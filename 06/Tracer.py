@@ -0,0 +1,216 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 23:48:02 2026
+
+@author: mlang
+"""
+import argparse
+from array import array
+from Emulator import Emulator, _A_INSTR, _C_A, _assignment, _key_event
+import HackTrace
+
+class Tracer(Emulator):
+    """An emulator that records the last `size` instructions it executed: the
+       program counter, A and D after each one, and the RAM location it wrote.
+       The records go into a ring of arrays allocated once, so tracing
+       doesn't allocate anything as the program runs.
+       A call to a native function is recorded as one step at the function's
+       address, with the registers it returns with and no write; passes
+       skipped in idle loops aren't recorded.
+    """
+    def __init__(self, rom, labels=None, native=True, size=65536):
+        if size <= 0:
+            raise Exception("The trace needs room for at least one step.")
+        self.size = size
+        self._new_ring()
+        super().__init__(rom, labels, native)
+
+    def _new_ring(self):
+        size = self.size
+        self._pcs = array('H', bytes(2 * size))
+        self._as = array('h', bytes(2 * size))
+        self._ds = array('h', bytes(2 * size))
+        self._addresses = array('H', bytes(2 * size))
+        self._values = array('h', bytes(2 * size))
+
+    def reset(self):
+        """Clears the RAM, the registers, and the trace
+        """
+        super().reset()
+        self._next = 0
+        self.steps = 0
+
+    def restore(self, state):
+        """Puts the machine back in a saved state and clears the trace
+        """
+        super().restore(state)
+        self._next = 0
+        self.steps = 0
+
+    def fork(self):
+        """Returns a new tracer in this one's state, with an empty trace of
+           its own
+        """
+        other = super().fork()
+        other._new_ring()
+        return other
+
+    def _columns(self, count):
+        """Returns the last `count` records of each column, oldest first
+        """
+        start = self._next - count
+        columns = (self._pcs, self._as, self._ds, self._addresses, self._values)
+        if start >= 0:
+            return [column[start:self._next] for column in columns]
+        return [column[start:] + column[:self._next] for column in columns]
+
+    def trace(self, count=None):
+        """Returns the last `count` steps, or all those recorded, oldest first,
+           as HackTrace.Steps
+        """
+        recorded = min(self.steps, self.size)
+        count = recorded if count is None else min(count, recorded)
+        pcs, a, d, addresses, values = self._columns(count)
+        first = self.steps - count
+        return [HackTrace.Step(first + i, pcs[i], self.rom[pcs[i]], a[i], d[i],
+                               None if addresses[i] == HackTrace.NO_WRITE else addresses[i],
+                               values[i])
+                for i in range(count)]
+
+    def save_trace(self, filename):
+        """Writes the recorded steps to a trace file
+        """
+        count = min(self.steps, self.size)
+        pcs, a, d, addresses, values = self._columns(count)
+        instructions = [self.rom[pc] for pc in pcs]
+        HackTrace.save(filename, self.steps - count, pcs, instructions, a, d, addresses, values)
+
+    def _execute(self, max_cycles):
+        """Emulator._execute with the recording added. It is a copy rather
+           than a hook called by Emulator._execute, since recording inline
+           runs about twice as fast as calling out on every instruction.
+           Changes to how either runs, calls native functions, or finds idle
+           loops have to be made to both; EngineParityTest checks that they
+           agree.
+        """
+        kinds, values, dests, jumps = self._kind, self._value, self._dest, self._jump
+        loops = self._idle_loops
+        natives = self._natives
+        stops = self._stops
+        alu = self._alu
+        ram = self.ram
+        pcs, a_s, d_s = self._pcs, self._as, self._ds
+        addresses, written = self._addresses, self._values
+        none = HackTrace.NO_WRITE
+        size, i = self.size, self._next
+        a, d, pc = self.a, self.d, self.pc
+        end = len(kinds)
+        remaining = -1 if max_cycles is None else max_cycles
+        count = 0
+        run_start = self._run_start - self.cycles
+        try:
+            while pc < end and count != remaining:
+                count += 1
+                pcs[i] = pc
+                kind = kinds[pc]
+                if kind == _A_INSTR:
+                    a = values[pc]
+                    a_s[i] = a
+                    d_s[i] = d
+                    addresses[i] = none
+                    i += 1
+                    if i == size:
+                        i = 0
+                    pc += 1
+                    continue
+                out = alu[values[pc]](d, a if kind == _C_A else ram[a & 0x7FFF])
+                target = a
+                dest = dests[pc]
+                addresses[i] = none
+                if dest:
+                    if dest & 1:
+                        ram[a & 0x7FFF] = out
+                        addresses[i] = a & 0x7FFF
+                        written[i] = out
+                    if dest & 2:
+                        d = out
+                    if dest & 4:
+                        a = out
+                a_s[i] = a
+                d_s[i] = d
+                i += 1
+                if i == size:
+                    i = 0
+                jump = jumps[pc]
+                if jump and (jump == 7 or (jump & 4 and out < 0)
+                             or (jump & 2 and out == 0) or (jump & 1 and out > 0)):
+                    target &= 0x7FFF
+                    if target in stops:
+                        loop = loops.get(target)
+                        if loop is not None and pc in loop and count - run_start >= loop[pc][0]:
+                            self._spin = loop[pc]
+                            pc = target
+                            run_start = count
+                            break
+                        native = natives.get(target)
+                        if native is not None:
+                            ret = native(ram)
+                            if ret is not None:
+                                a = pc = ret
+                                pcs[i] = target
+                                a_s[i] = a
+                                d_s[i] = d
+                                addresses[i] = none
+                                i += 1
+                                if i == size:
+                                    i = 0
+                                self.steps += 1
+                                run_start = count
+                                continue
+                    pc = target
+                    run_start = count
+                else:
+                    pc += 1
+        except IndexError:
+            # The instruction that failed is the last step
+            a_s[i], d_s[i], addresses[i] = a, d, none
+            i = i + 1 if i + 1 < size else 0
+            raise Exception("Memory access out of range at address {} (PC {})."
+                            .format(a & 0x7FFF, pc))
+        finally:
+            self.a, self.d, self.pc = a, d, pc
+            self._run_start = self.cycles + run_start
+            self.cycles += count
+            self.steps += count
+            self._next = i
+        return count
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("program", help="path to the .hack, binary image, or .asm file to run")
+    parser.add_argument("output", help="path to the trace file to write")
+    parser.add_argument("-n", "--cycles", type=int, default=10000000,
+                        help="maximum number of instructions to execute")
+    parser.add_argument("-s", "--set", type=_assignment, action="append", default=[],
+                        metavar="ADDR=VALUE", help="set a RAM location before running")
+    parser.add_argument("-k", "--key", type=_key_event, action="append", default=[],
+                        metavar="CYCLE=KEY", help="press a key (a code or a character, 0 to "
+                                                  "release) once CYCLE instructions have run")
+    parser.add_argument("-x", "--exact", action="store_true",
+                        help="run the Jack OS functions from ROM too, for exact cycle counts")
+    parser.add_argument("--size", type=int, default=65536,
+                        help="number of steps to keep")
+    args = parser.parse_args()
+    tracer = Tracer.from_file(args.program, native=not args.exact, size=args.size)
+    for address, value in args.set:
+        tracer.ram[address] = value
+    for cycle, key in args.key:
+        tracer.schedule_key(cycle, key)
+    try:
+        tracer.run(args.cycles)
+    finally:
+        # A program that failed leaves the trace leading up to the failure
+        tracer.save_trace(args.output)
+    print("{} after {} instructions; wrote the last {} to '{}'".format(
+          "Halted" if tracer.halted else "Stopped", tracer.cycles,
+          min(tracer.steps, tracer.size), args.output))
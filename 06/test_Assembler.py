@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 23:59:04 2026
+
+@author: mlang
+"""
+import os.path
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+import Assembler
+from Assembler import assemble_files, assemble_source
+
+_STACK_TEST = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "07",
+                           "StackArithmetic", "StackTest", "StackTest.asm")
+
+class JobsTest(unittest.TestCase):
+    """A single file given with jobs > 1 must still honour the other modes
+    """
+    def setUp(self):
+        self._dir = tempfile.mkdtemp()
+        self._source = shutil.copy(_STACK_TEST, self._dir)
+        self._output = os.path.splitext(self._source)[0] + ".hack"
+
+    def tearDown(self):
+        shutil.rmtree(self._dir)
+
+    def _assemble(self, jobs, **options):
+        self.assertEqual(assemble_files([self._source], jobs, **options), 0)
+        with open(self._output) as f:
+            return f.read().split()
+
+    def test_optimize_with_jobs(self):
+        plain = self._assemble(2)
+        serial = self._assemble(1, optimize=True)
+        parallel = self._assemble(2, optimize=True)
+        self.assertLess(len(serial), len(plain))
+        self.assertEqual(parallel, serial)
+
+    def test_single_pass_and_cache_with_jobs(self):
+        plain = self._assemble(1)
+        self.assertEqual(self._assemble(2, single_pass=True), plain)
+        self.assertEqual(self._assemble(2, cache_size=4096), plain)
+
+    def test_small_file_is_not_split(self):
+        plain = self._assemble(1)
+        with mock.patch.object(Assembler, "ProcessPoolExecutor",
+                               side_effect=AssertionError("started workers")):
+            self.assertEqual(self._assemble(4), plain)
+
+    def test_chunks_match_serial_output(self):
+        plain = self._assemble(1)
+        with mock.patch.object(Assembler.Assembler, "_MIN_CHUNK_SIZE", 1024):
+            self.assertEqual(self._assemble(4), plain)
+
+class EncodingTest(unittest.TestCase):
+    def test_not_m(self):
+        # a=1, comp=110001, dest=M
+        self.assertEqual(list(assemble_source("M=!M\nD=!M\nD=!D")),
+                         [0b1111110001001000, 0b1111110001010000, 0b1110001101010000])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,294 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 23:58:12 2026
+
+@author: mlang
+"""
+import unittest
+from Assembler import assemble_source
+from Emulator import Emulator
+from BlockEmulator import BlockEmulator
+from Profiler import Profiler
+from Tracer import Tracer
+
+# Jumps into the middle of a loop that leaves it if R1 isn't zero. The test
+# at the top of the loop hasn't run when it first jumps back to the head.
+_MID_ENTRY = """
+    @MID
+    0;JMP
+(LOOP)
+    @R1
+    D=M
+    @EXIT
+    D;JNE
+(MID)
+    @LOOP
+    0;JMP
+(EXIT)
+    @42
+    D=A
+    @R2
+    M=D
+(END)
+    @END
+    0;JMP
+"""
+
+class IdleLoopTest(unittest.TestCase):
+    engines = (Emulator, BlockEmulator, Profiler, Tracer)
+
+    def _run(self, cls, r1):
+        emulator = cls(assemble_source(_MID_ENTRY))
+        emulator.ram[1] = r1
+        emulator.run(1000)
+        return emulator
+
+    def test_mid_entry_leaves_loop(self):
+        for cls in self.engines:
+            emulator = self._run(cls, 5)
+            self.assertEqual(emulator.ram[2], 42, cls.__name__)
+            self.assertTrue(emulator.idle, cls.__name__)
+            self.assertEqual(emulator.cycles, 14, cls.__name__)
+
+    def test_mid_entry_idles_after_a_whole_pass(self):
+        for cls in self.engines:
+            emulator = self._run(cls, 0)
+            self.assertEqual(emulator.ram[2], 0, cls.__name__)
+            self.assertTrue(emulator.idle, cls.__name__)
+            # The jump in, the rest of the loop, and one pass from the head
+            self.assertEqual(emulator.cycles, 10, cls.__name__)
+
+# Counts up in R0 forever
+_COUNTER = """
+    @5
+    D=A
+(LOOP)
+    @R0
+    M=M+1
+    @LOOP
+    0;JMP
+"""
+
+class TracerTest(unittest.TestCase):
+    def _pcs(self, tracer):
+        return [step.pc for step in tracer.trace()]
+
+    def test_fork_has_a_trace_of_its_own(self):
+        parent = Tracer(assemble_source(_COUNTER), size=8)
+        parent.run(10)
+        before = self._pcs(parent)
+        child = parent.fork()
+        child.run(3)
+        self.assertEqual(self._pcs(parent), before)
+        self.assertEqual(parent.steps, 10)
+        self.assertEqual(self._pcs(child), [2, 3, 4])
+        self.assertEqual(child.steps, 3)
+        self.assertEqual((parent.ram[0], child.ram[0]), (2, 3))
+
+    def test_restore_clears_the_trace(self):
+        tracer = Tracer(assemble_source(_COUNTER), size=8)
+        tracer.run(4)
+        state = tracer.snapshot()
+        tracer.run(6)
+        tracer.restore(state)
+        self.assertEqual(tracer.trace(), [])
+        tracer.run(2)
+        self.assertEqual(self._pcs(tracer), [4, 5])
+
+class BlockCacheTest(unittest.TestCase):
+    def setUp(self):
+        BlockEmulator._block_cache.clear()
+
+    def test_same_program_shares_blocks(self):
+        rom = assemble_source(_COUNTER)
+        self.assertIs(BlockEmulator(rom)._blocks, BlockEmulator(rom)._blocks)
+
+    def test_cache_is_bounded(self):
+        size = BlockEmulator._BLOCK_CACHE_SIZE
+        first = BlockEmulator(assemble_source("@100\nD=A"))
+        for i in range(1, size + 2):
+            BlockEmulator(assemble_source("@{}\nD=A".format(i)))
+        self.assertEqual(len(BlockEmulator._block_cache), size)
+        # The emulator keeps its blocks after they leave the cache
+        first.run()
+        self.assertEqual(first.d, 100)
+
+    def test_profiler_blocks_are_not_cached(self):
+        Profiler(assemble_source(_COUNTER))
+        self.assertEqual(len(BlockEmulator._block_cache), 0)
+
+# Calls Math.multiply(6, 7) the way a VM call does, with ARG at 256, the
+# frame at 258-262, and LCL and SP at 263, and keeps the result in R5. The
+# function's code multiplies by repeated addition and returns as the VM
+# return does, unless the emulator runs it natively. A holds the return
+# address on the way back, which goes in R6.
+_CALL = """
+    @6
+    D=A
+    @256
+    M=D
+    @7
+    D=A
+    @257
+    M=D
+    @RET
+    D=A
+    @258
+    M=D
+    @256
+    D=A
+    @ARG
+    M=D
+    @263
+    D=A
+    @LCL
+    M=D
+    @SP
+    M=D
+    @Math.multiply
+    0;JMP
+(RET)
+    D=A
+    @R6
+    M=D
+    @256
+    D=M
+    @R5
+    M=D
+(END)
+    @END
+    0;JMP
+(Math.multiply)
+    @R13
+    M=0
+    @ARG
+    A=M+1
+    D=M
+    @R14
+    M=D
+(Math.multiply$LOOP)
+    @R14
+    D=M
+    @Math.multiply$DONE
+    D;JLE
+    @ARG
+    A=M
+    D=M
+    @R13
+    M=D+M
+    @R14
+    M=M-1
+    @Math.multiply$LOOP
+    0;JMP
+(Math.multiply$DONE)
+    @R13
+    D=M
+    @ARG
+    A=M
+    M=D
+    @ARG
+    D=M+1
+    @SP
+    M=D
+    @LCL
+    D=M
+    @R15
+    M=D
+    @5
+    A=D-A
+    D=M
+    @R14
+    M=D
+    @R15
+    AM=M-1
+    D=M
+    @THAT
+    M=D
+    @R15
+    AM=M-1
+    D=M
+    @THIS
+    M=D
+    @R15
+    AM=M-1
+    D=M
+    @ARG
+    M=D
+    @R15
+    AM=M-1
+    D=M
+    @LCL
+    M=D
+    @R14
+    A=M
+    0;JMP
+"""
+
+# Waits for a key, keeps it in R0, waits for its release, and counts the
+# presses in R1
+_KEYS = """
+(WAIT)
+    @KBD
+    D=M
+    @WAIT
+    D;JEQ
+    @R0
+    M=D
+(HELD)
+    @KBD
+    D=M
+    @HELD
+    D;JNE
+    @R1
+    M=M+1
+    @WAIT
+    0;JMP
+"""
+
+class EngineParityTest(unittest.TestCase):
+    """Tracer runs programs with a copy of Emulator._execute, and the block
+       emulators with compiled code, so all of them are run through the
+       same programs and must end in the same state
+    """
+    engines = (Emulator, BlockEmulator, Profiler, Tracer)
+
+    def _final(self, cls, source, native=True, keys=(), cycles=100000):
+        words, symbols = assemble_source(source, symbols=True)
+        emulator = cls(words, list(symbols.items()), native)
+        for cycle, key in keys:
+            emulator.schedule_key(cycle, key)
+        emulator.run(cycles)
+        return (list(emulator.ram), emulator.a, emulator.d, emulator.pc,
+                emulator.cycles, emulator.idle)
+
+    def _check(self, **options):
+        expected = self._final(Emulator, **options)
+        for cls in self.engines[1:]:
+            self.assertEqual(self._final(cls, **options), expected, cls.__name__)
+        return expected
+
+    def test_native_call(self):
+        native = self._check(source=_CALL, native=True)
+        exact = self._check(source=_CALL, native=False)
+        self.assertEqual(native[0][5], 42)
+        self.assertEqual(exact[0][5], 42)
+        self.assertEqual(native[0][6], exact[0][6])
+        # The native call takes no instructions
+        self.assertLess(native[4], exact[4])
+        self.assertTrue(native[5] and exact[5])
+
+    def test_idle_loop(self):
+        ram, a, d, pc, cycles, idle = self._check(source=_COUNTER.replace("M=M+1", "D=M"))
+        self.assertTrue(idle)
+        self.assertLess(cycles, 100)
+
+    def test_key_events(self):
+        keys = ((100, 65), (150, 0), (5000, 66), (5020, 0), (70000, 67))
+        ram, a, d, pc, cycles, idle = self._check(source=_KEYS, keys=keys)
+        self.assertEqual((ram[0], ram[1]), (67, 2))
+        # The last key is never released, so the program waits for good
+        self.assertTrue(idle)
+        self.assertLess(cycles, 70100)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,214 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 23:12:40 2026
+
+@author: mlang
+"""
+import argparse
+import os
+import os.path
+import random
+import tempfile
+import time
+from enum import Enum, unique
+from glob import glob
+from Lexer import Lexer, Token
+from VmToken import VmToken
+
+@unique
+class CharacterClass(Enum):
+    LETTER = 1
+    DIGIT = 2
+    WHITESPACE = 3
+    MISC_CHAR = 4
+    OTHER = 5
+    EOF = 6
+
+class CharLexer(Lexer):
+    """The original character-at-a-time lexer, kept as a baseline to measure
+       the line scanner against
+    """
+    def _file_iter(self):
+        with open(self.filename, 'r') as f:
+            for line in f:
+                for char in line:
+                    if self._skip_line:
+                        break
+                    yield char
+                self._skip_line = False
+
+    def _get_char(self):
+        try:
+            c = next(self._iter)
+            self.next_char = c
+            if c.isalpha():
+                self.char_class = CharacterClass.LETTER
+            elif c.isdecimal():
+                self.char_class = CharacterClass.DIGIT
+            elif c.isspace():
+                self.char_class = CharacterClass.WHITESPACE
+            elif c in ['_', '.', '-']:
+                self.char_class = CharacterClass.MISC_CHAR
+            else:
+                self.char_class = CharacterClass.OTHER
+        except StopIteration:
+            self.next_char = None
+            self.char_class = CharacterClass.EOF
+
+    def _lookup_keyword(self, lexeme):
+        a = ('add', 'sub', 'neg', 'eq', 'gt', 'lt', 'and', 'or', 'not')
+        b = {'push': 'PUSH', 'pop': 'POP',
+             'label': 'LABEL', 'goto': 'GOTO', 'if-goto': 'IF',
+             'function': 'FUNCTION', 'call': 'CALL', 'return': 'RETURN'}
+        if lexeme in a:
+            return VmToken.ARITHMETIC
+        else:
+            return VmToken[b.get(lexeme, 'IDENTIFIER')]
+
+    def _lex(self):
+        while self.char_class == CharacterClass.WHITESPACE:
+            self._get_char()
+        lexeme = self.next_char
+        if (self.char_class == CharacterClass.LETTER
+            or self.char_class == CharacterClass.MISC_CHAR):
+            self._get_char()
+            while (self.char_class == CharacterClass.LETTER
+                   or self.char_class == CharacterClass.DIGIT
+                   or self.char_class == CharacterClass.MISC_CHAR):
+                lexeme += self.next_char
+                self._get_char()
+            return Token(self._lookup_keyword(lexeme), lexeme)
+        elif self.char_class == CharacterClass.DIGIT:
+            self._get_char()
+            while self.char_class == CharacterClass.DIGIT:
+                lexeme += self.next_char
+                self._get_char()
+            return Token(VmToken.NUMBER, lexeme)
+        elif self.char_class == CharacterClass.OTHER:
+            if self.next_char == '/':
+                self._get_char()
+                if self.next_char == '/':
+                    self._skip_line = True
+                    self._get_char()
+                    return None
+            return Token(VmToken.ERROR, lexeme)
+        elif self.char_class == CharacterClass.EOF:
+            return Token(VmToken.EOF, None)
+        return Token(VmToken.ERROR, None)
+
+    def analyze(self):
+        self._iter = self._file_iter()
+        self._skip_line = False
+        self._get_char()
+        while True:
+            token = self._lex()
+            if token is None:
+                continue
+            if token.Token == VmToken.ERROR:
+                raise Exception("Bad token!", token.Lexeme)
+            self.tokens.append(token)
+            if token.Token == VmToken.EOF:
+                break
+
+_segments = ['argument', 'local', 'static', 'this', 'that', 'pointer', 'temp']
+_operators = ['add', 'sub', 'neg', 'eq', 'gt', 'lt', 'and', 'or', 'not']
+
+def generate_source(lines, seed=0):
+    """Returns the text of a made-up VM program with about `lines` lines, in
+       the proportions of compiled Jack code: mostly pushes, pops, and
+       arithmetic, with labels, jumps, calls, and the odd comment
+    """
+    rng = random.Random(seed)
+    out = []
+    function = 0
+    while len(out) < lines:
+        function += 1
+        name = "Class{}.method{}".format(function % 37, function)
+        out.append("function {} {}".format(name, rng.randrange(6)))
+        for i in range(rng.randrange(20, 120)):
+            r = rng.random()
+            if r < 0.40:
+                out.append("push {} {}".format(rng.choice(_segments + ['constant']),
+                                               rng.randrange(200)))
+            elif r < 0.60:
+                out.append("pop {} {}".format(rng.choice(_segments), rng.randrange(8)))
+            elif r < 0.80:
+                out.append(rng.choice(_operators))
+            elif r < 0.86:
+                out.append("label {}{}".format(rng.choice(["WHILE_EXP", "IF_TRUE"]), i))
+            elif r < 0.90:
+                out.append("if-goto IF_TRUE{}".format(i))
+            elif r < 0.93:
+                out.append("goto WHILE_EXP{}".format(i))
+            elif r < 0.98:
+                out.append("call Class{}.method{} {}".format(rng.randrange(37),
+                                                             rng.randrange(function + 1),
+                                                             rng.randrange(4)))
+            else:
+                out.append("// {}".format(name))
+        out.append("return")
+    return "\n".join(out) + "\n"
+
+def make_input(sources, repeat, lines):
+    """Writes `repeat` copies of the .vm files given, or of files in the
+       directories given, to a temporary file and returns its name. Without
+       sources, a generated program of `lines` lines is used.
+    """
+    files = []
+    for source in sources:
+        files += sorted(glob(os.path.join(source, "*.vm"))) if os.path.isdir(source) else [source]
+    if files:
+        texts = []
+        for name in files:
+            with open(name, 'r') as f:
+                texts.append(f.read())
+        text = "\n".join(texts)
+    else:
+        text = generate_source(lines)
+    fd, name = tempfile.mkstemp(suffix=".vm")
+    with os.fdopen(fd, 'w') as f:
+        for _ in range(repeat):
+            f.write(text)
+    return name
+
+def time_lexer(cls, filename, rounds):
+    """Returns the best wall time of `rounds` runs and the tokens
+    """
+    best = None
+    for _ in range(rounds):
+        lexer = cls(filename)
+        start = time.perf_counter()
+        lexer.analyze()
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best, lexer.tokens
+
+def bench_lexer(filename, rounds):
+    size = os.path.getsize(filename) / 1e6
+    print("Lexing '{}' ({:.1f} MB)".format(filename, size))
+    base, tokens = time_lexer(CharLexer, filename, rounds)
+    print("  per-character : {:7.3f} s  {:6.2f} MB/s".format(base, size / base))
+    new, new_tokens = time_lexer(Lexer, filename, rounds)
+    print("  line scanner  : {:7.3f} s  {:6.2f} MB/s".format(new, size / new))
+    if tokens != new_tokens:
+        raise Exception("The lexers disagree.")
+    print("  {} tokens, speedup {:.1f}x".format(len(tokens), base / new))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("sources", nargs='*',
+                        help=".vm files or directories to use as the benchmark input; "
+                             "a generated program by default")
+    parser.add_argument("-r", "--repeat", type=int, default=20,
+                        help="number of copies of the sources to concatenate")
+    parser.add_argument("-l", "--lines", type=int, default=20000,
+                        help="number of lines of the generated program")
+    parser.add_argument("-n", "--rounds", type=int, default=3,
+                        help="number of timed runs; the best is reported")
+    args = parser.parse_args()
+    infile = make_input(args.sources, args.repeat, args.lines)
+    try:
+        bench_lexer(infile, args.rounds)
+    finally:
+        os.remove(infile)
@@ -28,10 +28,22 @@ class CodeWriter(object):
     
     _temp_reg = ["R13", "R14", "R15"]
 
-    def __init__(self, out_filename):
+    # Labels of the shared routines used in compact mode
+    _call_routine = "VM$CALL"
+    _return_routine = "VM$RETURN"
+    _compare_routines = {"JEQ": "VM$EQ", "JGT": "VM$GT", "JLT": "VM$LT"}
+
+    def __init__(self, out_filename, compact=False):
+        """:param compact: Emits call, return, and the comparisons as jumps to
+                           routines shared by the whole program, to make
+                           the code smaller at the cost of a few cycles
+        """
         self._out_filename = out_filename
+        self._compact = compact
         self._label_count = 0
         self._curr_func = ''
+        # Number of instructions written, i.e. the size of the ROM image
+        self.rom_size = 0
 
     def __enter__(self):
         self._file = open(self._out_filename, 'w')
@@ -66,6 +78,9 @@ class CodeWriter(object):
 
         :param jump: The jump value for the comparison (JEQ, JLT, JGT)
         """
+        if self._compact:
+            self._call_routine_at(self._compare_routines[jump])
+            return
         self._pop_to_dest("D")    # pop Op2
         self._pop_to_dest("A")    # pop Op1
         self._c_command("D", "A-D") # Op1-Op2
@@ -83,6 +98,15 @@ class CodeWriter(object):
         # (neq_label)
         self._l_command(neq_label)
 
+    def _call_routine_at(self, routine):
+        """Jumps to a shared routine with the return address in D
+        """
+        return_label = self._get_label()
+        self._a_command(return_label)   # @return_label
+        self._c_command("D", "A")       # D=A
+        self._jump(routine, None, "0", "JMP")
+        self._l_command(return_label)   # (return_label)
+
     def _jump(self, label, dest, comp, jump):
         """Generates a pair of commands to jump to the given label
         """
@@ -244,6 +268,7 @@ class CodeWriter(object):
     def _a_command(self, value):
         """Generates an a-command for the given value
         """
+        self.rom_size += 1
         self._writeline("@{}".format(value))
 
     def _c_command(self, dest, comp, jump=None):
@@ -251,6 +276,7 @@ class CodeWriter(object):
         """
         if comp == None:
             raise Exception('Invalid value "{}" for comp field.'.format(comp))
+        self.rom_size += 1
         line = ''
         if dest != None:
             line = dest + '='
@@ -291,6 +317,70 @@ class CodeWriter(object):
         self._a_command("SP")
         self._c_command("M", "D")
         self.write_call("Sys.init", 0)
+        if self._compact:
+            # Sys.init doesn't return, but should it, stop here rather than
+            # run into the shared routines
+            halt_label = "VM$HALT"
+            self._l_command(halt_label)
+            self._jump(halt_label, None, "0", "JMP")
+            self._write_call_routine()
+            self._write_return_routine()
+            self._write_compare_routines()
+
+    def _write_call_routine(self):
+        """Generates the routine shared by all calls in compact mode. It takes
+           the return address in D, the number of arguments in R13, and the
+           address of the function in R14.
+        """
+        self._l_command(self._call_routine)
+        self._push_comp("D")            # push return address
+        self._push_reg("LCL")
+        self._push_reg("ARG")
+        self._push_reg("THIS")
+        self._push_reg("THAT")
+        self._a_command("SP")           # @SP
+        self._c_command("D", "M")       # D=M
+        self._a_command("R13")          # @R13
+        self._c_command("D", "D-M")     # D=D-M
+        self._a_command(5)              # @5
+        self._c_command("D", "D-A")     # D=D-A
+        self._a_command("ARG")          # @ARG
+        self._c_command("M", "D")       # M=D
+        self._a_command("SP")           # @SP
+        self._c_command("D", "M")       # D=M
+        self._a_command("LCL")          # @LCL
+        self._c_command("M", "D")       # M=D
+        self._a_command("R14")          # @R14
+        self._c_command("A", "M")       # A=M
+        self._c_command(None, 0, "JMP") # 0;JMP
+
+    def _write_return_routine(self):
+        """Generates the routine shared by all returns in compact mode
+        """
+        self._l_command(self._return_routine)
+        self._return()
+
+    def _write_compare_routines(self):
+        """Generates the routines shared by all the comparisons of each kind
+           in compact mode. They take the return address in D.
+        """
+        true_label = "VM$TRUE"
+        false_label = "VM$FALSE"
+        for jump, routine in sorted(self._compare_routines.items()):
+            self._l_command(routine)
+            self._a_command("R15")      # @R15
+            self._c_command("M", "D")   # RAM[R15]=D
+            self._pop_to_dest("D")      # pop Op2
+            self._pop_to_dest("A")      # pop Op1
+            self._c_command("D", "A-D") # Op1-Op2
+            self._jump(true_label, None, "D", jump)
+            self._jump(false_label, None, "0", "JMP")
+        for label, comp in ((true_label, "-1"), (false_label, "0")):
+            self._l_command(label)
+            self._push_comp(comp)
+            self._a_command("R15")
+            self._c_command("A", "M")
+            self._c_command(None, 0, "JMP")
     
     def set_filename(self, filename):
         self._curr_file = filename
@@ -319,6 +409,22 @@ class CodeWriter(object):
     def write_call(self, function_name, num_args):
         """Translates the CALL command
         """
+        if self._compact:
+            n = int(num_args)
+            if n == 0 or n == 1:
+                self._a_command("R13")      # @R13
+                self._c_command("M", n)     # M=n
+            else:
+                self._a_command(n)          # @num_args
+                self._c_command("D", "A")   # D=A
+                self._a_command("R13")      # @R13
+                self._c_command("M", "D")   # M=D
+            self._a_command(function_name)  # @function_name
+            self._c_command("D", "A")       # D=A
+            self._a_command("R14")          # @R14
+            self._c_command("M", "D")       # M=D
+            self._call_routine_at(self._call_routine)
+            return
         return_label = self._get_label()
         self._push_value(return_label)  # push return address
         self._push_reg("LCL")
@@ -343,6 +449,14 @@ class CodeWriter(object):
     def write_return(self):
         """Translates the RETURN command
         """
+        if self._compact:
+            self._jump(self._return_routine, None, "0", "JMP")
+        else:
+            self._return()
+
+    def _return(self):
+        """Generates the code of a return
+        """
         # Store LCL address to R13 ("FRAME")
         self._a_command("LCL")      # @LCL
         self._c_command("D", "M")   # D=RAM[LCL]
@@ -11,6 +11,9 @@ from CodeWriter import CodeWriter
 from VmToken import VmToken
 
 class VMtranslator(object):
+    # Number of instructions that fit in the Hack ROM
+    ROM_SIZE = 32768
+
     def __init__(self, source):
         self._set_inputs(source)
     
@@ -32,14 +35,36 @@ class VMtranslator(object):
         if basename != None:
             self._out_filename = os.path.join(dirname, "{}.asm".format(basename))
     
-    def translate(self):
+    def translate(self, compact=False):
+        """Translates the source files. With `compact`, call, return, and the
+           comparisons jump to routines shared by the whole program, and the
+           size of the ROM image is reported with and without them.
+           Returns the number of instructions written.
+        """
         print("Starting translation...")
         if (self._file_list is None) or (len(self._file_list) == 0):
             raise Exception("No valid files to translate.")
-        with CodeWriter(self._out_filename) as writer:
+        size = self._write(self._out_filename, compact, True)
+        print("Translation complete.\nOutput is '{}'".format(self._out_filename))
+        if compact:
+            full_size = self._write(os.devnull, False, False)
+            print("ROM size: {} instructions, {} without shared routines ({:.1f}% smaller)"
+                  .format(size, full_size, 100.0 * (full_size - size) / full_size))
+        else:
+            print("ROM size: {} instructions".format(size))
+        if size > self.ROM_SIZE:
+            print("Warning: the program doesn't fit in the {} words of ROM."
+                  .format(self.ROM_SIZE))
+        return size
+
+    def _write(self, out_filename, compact, verbose):
+        """Writes the translation to the given file and returns its size
+        """
+        with CodeWriter(out_filename, compact) as writer:
             writer.write_init()
             for infile in self._file_list:
-                print("Processing file '{}' ...".format(infile))
+                if verbose:
+                    print("Processing file '{}' ...".format(infile))
                 writer.set_filename(os.path.splitext(os.path.basename(infile))[0])
                 p = Parser(infile)
                 while p.has_more_commands():
@@ -62,11 +87,14 @@ class VMtranslator(object):
                         writer.write_return()
                     else:
                         raise Exception('Unknown command type "{}".'.format(p.command_type))
-        print("Translation complete.\nOutput is '{}'".format(self._out_filename))
+        return writer.rom_size
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("source", help="path to the file or files to translate")
+    parser.add_argument("-c", "--compact", action="store_true",
+                        help="share the code of call, return, and the comparisons "
+                             "between all their uses, to make the program smaller")
     args = parser.parse_args()
     translator = VMtranslator(args.source)
-    translator.translate()
\ No newline at end of file
+    translator.translate(args.compact)
\ No newline at end of file